@@ -0,0 +1,339 @@
+import itertools
+import json
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.utils.dateparse import parse_datetime
+from foodgram.models import Ingredient, IngredientAmount, Recipe, Tag
+from core.exceptions import InvalidRecipeArchiveError
+
+from . import cache
+from .ingredient_index import ingredient_index
+from .pantry_index import pantry_index
+from .search import update_search_vectors
+from .services import change_counters
+
+ARCHIVE_FORMAT = 'foodgram-recipes'
+ARCHIVE_VERSION = 1
+RECORD_FIELDS = {
+    'name', 'author', 'text', 'cooking_time', 'image', 'date_created',
+    'date_modified', 'tags', 'ingredients'
+}
+
+User = get_user_model()
+
+
+def get_timestamps(recipes):
+    """Return {name: (date_created, date_modified)} of unsaved recipes."""
+    return {
+        recipe.name: (recipe.date_created, recipe.date_modified)
+        for recipe in recipes
+    }
+
+
+def set_timestamps(timestamps):
+    """
+    Give bulk inserted recipes the dates from get_timestamps():
+    bulk_create stamps auto_now fields with the current time,
+    an UPDATE leaves them as they are.
+    """
+    operations = connection.ops
+    table = operations.quote_name(Recipe._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {table} SET date_created = %s, date_modified = %s '
+            'WHERE name = %s',
+            [
+                (
+                    operations.adapt_datetimefield_value(date_created),
+                    operations.adapt_datetimefield_value(date_modified),
+                    name
+                )
+                for name, (date_created, date_modified) in timestamps.items()
+            ]
+        )
+
+
+def get_archive_queryset():
+    """Recipes with everything written to the archive."""
+    return Recipe.objects.defer('search_vector').select_related(
+        'author', 'last_editor'
+    ).prefetch_related(
+        'tags',
+        Prefetch(
+            'ingredient_amounts',
+            queryset=IngredientAmount.objects.select_related(
+                'ingredient'
+            ).order_by('pk')
+        )
+    )
+
+
+def get_record(recipe) -> dict:
+    """Return recipe with its tags and ingredients by name."""
+    return {
+        'name': recipe.name,
+        'author': recipe.author.username,
+        'last_editor': recipe.last_editor.username,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'image': recipe.image.name,
+        'image_variants': recipe.image_variants,
+        'date_created': recipe.date_created.isoformat(),
+        'date_modified': recipe.date_modified.isoformat(),
+        'tags': [
+            {'name': tag.name, 'slug': tag.slug, 'color': tag.color}
+            for tag in recipe.tags.all()
+        ],
+        'ingredients': [
+            {
+                'name': amount.ingredient.name,
+                'measurement_unit': amount.ingredient.measurement_unit,
+                'amount': amount.amount,
+            }
+            for amount in recipe.ingredient_amounts.all()
+        ],
+    }
+
+
+def write_archive(file, queryset=None, batch_size=1000):
+    """
+    Write recipes as newline delimited json after a header line,
+    loading them in batches of ids. Return number of recipes.
+    """
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    file.write(json.dumps(
+        {'format': ARCHIVE_FORMAT, 'version': ARCHIVE_VERSION}
+    ) + '\n')
+    written = 0
+    last_id = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last_id).order_by(
+                'pk'
+            ).values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return written
+        for recipe in get_archive_queryset().filter(pk__in=ids).order_by(
+            'pk'
+        ):
+            file.write(json.dumps(get_record(recipe), ensure_ascii=False))
+            file.write('\n')
+        written += len(ids)
+        last_id = ids[-1]
+
+
+def read_archive(file):
+    """Check the header line and yield recipe records."""
+    lines = enumerate(file, start=1)
+    try:
+        header = json.loads(next(lines, (0, '{}'))[1])
+    except json.JSONDecodeError:
+        header = {}
+    if header.get('format') != ARCHIVE_FORMAT:
+        raise InvalidRecipeArchiveError('файл не является архивом рецептов')
+    if header.get('version') != ARCHIVE_VERSION:
+        raise InvalidRecipeArchiveError(
+            f'неподдерживаемая версия архива: {header.get("version")}'
+        )
+    for number, line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise InvalidRecipeArchiveError(f'строка {number}: {e}')
+        missing = RECORD_FIELDS - set(record)
+        if missing:
+            raise InvalidRecipeArchiveError(
+                f'строка {number}: нет полей {", ".join(sorted(missing))}'
+            )
+        yield record
+
+
+class RecipeImporter:
+    """
+    Insert archived recipes batch by batch, one transaction each.
+    Ingredients, tags and authors are resolved through in-memory
+    maps from name to id, filled as names show up, missing
+    ingredients and tags are created.
+    Recipes with names already taken are skipped, recipes of unknown
+    users are given to the default author.
+    """
+
+    def __init__(self, default_author):
+        self.default_author = default_author
+        self.ingredients = {}
+        self.tags = dict(Tag.objects.values_list('slug', 'pk'))
+        self.users = {}
+        self.stats = Counter()
+
+    def resolve_users(self, records):
+        usernames = {
+            username for record in records
+            for username in (record['author'], record.get('last_editor'))
+            if username and username not in self.users
+        }
+        if usernames:
+            self.users.update(User.objects.filter(
+                username__in=usernames
+            ).values_list('username', 'pk'))
+        for username in usernames - set(self.users):
+            self.users[username] = None
+
+    def resolve_ingredients(self, records):
+        """Look up ingredients new to the map, create missing ones."""
+        units = {
+            item['name']: item['measurement_unit']
+            for record in records for item in record['ingredients']
+            if item['name'] not in self.ingredients
+        }
+        if not units:
+            return
+        self.ingredients.update(Ingredient.objects.filter(
+            name__in=units
+        ).values_list('name', 'pk'))
+        missing = set(units) - set(self.ingredients)
+        if not missing:
+            return
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(
+                    name=name, measurement_unit=units[name],
+                    author=self.default_author,
+                    last_editor=self.default_author
+                )
+                for name in missing
+            ],
+            ignore_conflicts=True
+        )
+        self.ingredients.update(Ingredient.objects.filter(
+            name__in=missing
+        ).values_list('name', 'pk'))
+        self.stats['ingredients'] += len(missing)
+
+    def resolve_tags(self, records):
+        missing = {
+            tag['slug']: tag
+            for record in records for tag in record['tags']
+            if tag['slug'] not in self.tags
+        }
+        if not missing:
+            return
+        Tag.objects.bulk_create(
+            [
+                Tag(
+                    name=tag['name'], slug=slug, color=tag['color'],
+                    author=self.default_author,
+                    last_editor=self.default_author
+                )
+                for slug, tag in missing.items()
+            ],
+            ignore_conflicts=True
+        )
+        self.tags.update(Tag.objects.filter(
+            slug__in=missing
+        ).values_list('slug', 'pk'))
+        conflicts = set(missing) - set(self.tags)
+        if conflicts:
+            raise InvalidRecipeArchiveError(
+                'теги совпадают по названию или цвету с существующими: '
+                f'{", ".join(sorted(conflicts))}'
+            )
+        self.stats['tags'] += len(missing)
+
+    def get_user_id(self, username):
+        return self.users.get(username) or self.default_author.pk
+
+    @transaction.atomic
+    def import_batch(self, records):
+        """Insert recipes of one batch with their tags and ingredients."""
+        seen = set(Recipe.objects.filter(
+            name__in=[record['name'] for record in records]
+        ).values_list('name', flat=True))
+        unique = []
+        for record in records:
+            if record['name'] not in seen:
+                seen.add(record['name'])
+                unique.append(record)
+        self.stats['skipped'] += len(records) - len(unique)
+        records = unique
+        if not records:
+            return
+        self.resolve_users(records)
+        self.resolve_ingredients(records)
+        self.resolve_tags(records)
+        recipes = []
+        for record in records:
+            author_id = self.get_user_id(record['author'])
+            if self.users.get(record['author']) is None:
+                self.stats['reassigned'] += 1
+            recipes.append(Recipe(
+                name=record['name'],
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=record['image'],
+                image_variants=record.get('image_variants') or {},
+                author_id=author_id,
+                last_editor_id=self.get_user_id(
+                    record.get('last_editor') or record['author']
+                ),
+                date_created=parse_datetime(record['date_created']),
+                date_modified=parse_datetime(record['date_modified']),
+            ))
+        timestamps = get_timestamps(recipes)
+        Recipe.objects.bulk_create(recipes)
+        set_timestamps(timestamps)
+        # sqlite does not return ids of bulk inserted rows
+        recipe_ids = dict(Recipe.objects.filter(
+            name__in=[recipe.name for recipe in recipes]
+        ).values_list('name', 'pk'))
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(
+                recipe_id=recipe_ids[record['name']],
+                tag_id=self.tags[slug]
+            )
+            for record in records
+            for slug in {tag['slug'] for tag in record['tags']}
+        ])
+        IngredientAmount.objects.bulk_create([
+            IngredientAmount(
+                recipe_id=recipe_ids[record['name']],
+                ingredient_id=self.ingredients[name],
+                amount=amount
+            )
+            for record in records
+            for name, amount in {
+                item['name']: item['amount']
+                for item in record['ingredients']
+            }.items()
+        ])
+        authors = Counter(recipe.author_id for recipe in recipes)
+        for author_id, count in authors.items():
+            change_counters(
+                User.objects.filter(pk=author_id), recipes_count=count
+            )
+        update_search_vectors(
+            Recipe.objects.filter(pk__in=recipe_ids.values())
+        )
+        self.stats['created'] += len(recipes)
+
+    def run(self, records, batch_size=1000):
+        """Import all records, return counts of what was done."""
+        records = iter(records)
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                break
+            self.import_batch(batch)
+        # bulk inserts send no signals
+        if self.stats['ingredients']:
+            ingredient_index.invalidate()
+        if self.stats['created']:
+            pantry_index.invalidate()
+            cache.invalidate('recipes', 'ingredients', 'tags')
+        return self.stats
@@ -0,0 +1,90 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls.resolvers import URLPattern
+from rest_framework.permissions import SAFE_METHODS
+from core.db import check_connections
+
+# read endpoints served by async views in the asgi mode,
+# their other methods run as sync views
+ASYNC_VIEW_NAMES = {
+    'tags-list', 'tags-detail', 'ingredients-list', 'ingredients-detail',
+    'recipes-list', 'recipes-detail', 'download_shopping_cart',
+}
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_VIEW_THREADS,
+    thread_name_prefix='async-view'
+)
+
+
+def track_parts(content, metrics):
+    """Measure queries made reading each part of streamed content."""
+    iterator = iter(content)
+    while True:
+        with metrics.track():
+            part = next(iterator, None)
+        if part is None:
+            return
+        yield part
+
+
+def run_view(view, request, *args, **kwargs):
+    """
+    Run sync view in a pool thread with its own database connection.
+    The response is rendered there too, so the event loop only sends
+    bytes to clients, slow ones included. Streamed content is read
+    part by part by core.asgi.ASGIHandler in a thread of its own.
+    """
+    metrics = getattr(request, 'query_metrics', None)
+    close_old_connections()
+    check_connections()
+    try:
+        with metrics.track() if metrics is not None else nullcontext():
+            response = view(request, *args, **kwargs)
+            if callable(getattr(response, 'render', None)):
+                response = response.render()
+            if response.streaming and metrics is not None:
+                response.streaming_content = track_parts(
+                    response.streaming_content, metrics
+                )
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    """
+    Wrap sync view into an async one. Django 3.2 has no async orm,
+    so the view itself runs in the thread pool and does not block
+    the single thread the asgi handler keeps for sync views.
+    Writes to the same routes stay in that thread, as with sync views.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return await sync_to_async(view)(request, *args, **kwargs)
+        return await sync_to_async(
+            run_view, thread_sensitive=False, executor=executor
+        )(view, request, *args, **kwargs)
+
+    return wrapper
+
+
+def get_async_patterns(patterns):
+    """Return url patterns with read endpoints served by async views."""
+    if not settings.ASYNC_VIEWS:
+        return patterns
+    return [
+        URLPattern(
+            pattern.pattern, async_view(pattern.callback),
+            pattern.default_args, pattern.name
+        )
+        if isinstance(pattern, URLPattern)
+        and pattern.name in ASYNC_VIEW_NAMES else pattern
+        for pattern in patterns
+    ]
@@ -0,0 +1,306 @@
+import csv
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from foodgram.models import (FavouriteList, Ingredient, IngredientAmount,
+                             Recipe, ShoppingList, Subscription, Tag)
+
+from . import cache
+from .archive import get_timestamps, set_timestamps
+from .services import rebuild_shopping_cart_totals, reconcile_counters
+
+BENCHMARK_PREFIX = 'benchmark'
+
+User = get_user_model()
+
+
+def get_benchmark_user(number=0):
+    """Return synthetic user, creating it if needed."""
+    username = f'{BENCHMARK_PREFIX}-user-{number}'
+    user, _ = User.objects.get_or_create(
+        username=username,
+        defaults={
+            'email': f'{username}@example.com',
+            'first_name': 'Benchmark',
+            'last_name': str(number),
+        }
+    )
+    return user
+
+
+def create_recipes(count, authors=None, batch_size=5000, describe=None):
+    """
+    Add synthetic recipes until there are at least count of them,
+    one minute apart so that keyset ordering has no ties,
+    written by given authors in turn.
+    describe(number) may return name suffix and description.
+    """
+    authors = authors or [get_benchmark_user()]
+    existing = Recipe.objects.filter(
+        name__startswith=f'{BENCHMARK_PREFIX}-recipe-'
+    ).count()
+    now = timezone.now()
+    for start in range(existing, count, batch_size):
+        recipes = []
+        for number in range(start, min(start + batch_size, count)):
+            date = now - timedelta(minutes=number)
+            suffix, text = '', 'Synthetic recipe for benchmarks.'
+            if describe is not None:
+                suffix, text = describe(number)
+            author = authors[number % len(authors)]
+            recipes.append(Recipe(
+                name=f'{BENCHMARK_PREFIX}-recipe-{number}{suffix}',
+                text=text,
+                image='recipes/benchmark.png',
+                cooking_time=number % 120 + 1,
+                author=author,
+                last_editor=author,
+                date_created=date,
+                date_modified=date,
+            ))
+        timestamps = get_timestamps(recipes)
+        Recipe.objects.bulk_create(recipes)
+        set_timestamps(timestamps)
+    cache.invalidate('recipes')
+    return max(count - existing, 0)
+
+
+def get_benchmark_ingredients(count):
+    """Return ids of synthetic ingredients, creating missing ones."""
+    author = get_benchmark_user()
+    Ingredient.objects.bulk_create(
+        [
+            Ingredient(
+                name=f'{BENCHMARK_PREFIX}-ingredient-{number}',
+                measurement_unit='г',
+                author=author,
+                last_editor=author,
+            )
+            for number in range(count)
+        ],
+        ignore_conflicts=True
+    )
+    return list(Ingredient.objects.filter(
+        name__startswith=f'{BENCHMARK_PREFIX}-ingredient-'
+    ).order_by('pk').values_list('pk', flat=True)[:count])
+
+
+def get_catalog_ingredients(path, count=None):
+    """
+    Return ids of ingredients listed in a name,unit csv file
+    such as data/ingredients.csv, creating missing ones.
+    """
+    with open(path, encoding='utf-8') as file:
+        rows = [row for row in csv.reader(file) if len(row) == 2]
+    rows = rows[:count]
+    author = get_benchmark_user()
+    Ingredient.objects.bulk_create(
+        [
+            Ingredient(
+                name=name.strip(),
+                measurement_unit=unit.strip(),
+                author=author,
+                last_editor=author,
+            )
+            for name, unit in rows
+        ],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+    return list(Ingredient.objects.filter(
+        name__in=[name.strip() for name, _ in rows]
+    ).order_by('pk').values_list('pk', flat=True))
+
+
+def get_ingredient_weights(ingredient_ids):
+    """Zipf-like popularity: salt is everywhere, saffron is rare."""
+    return [1 / rank for rank in range(1, len(ingredient_ids) + 1)]
+
+
+def pick_ingredients(rand, ingredient_ids, weights, count):
+    """Pick distinct ingredients, the first ones being the most common."""
+    picked = set()
+    while len(picked) < count:
+        picked.update(rand.choices(ingredient_ids, weights, k=count))
+    return list(picked)[:count]
+
+
+def get_benchmark_recipes():
+    return Recipe.objects.filter(
+        name__startswith=f'{BENCHMARK_PREFIX}-recipe-'
+    )
+
+
+def get_ingredients_count(rand):
+    """About 9 ingredients on average, rarely more than 16."""
+    return min(max(round(rand.lognormvariate(2.1, 0.4)), 2), 25)
+
+
+def seed_ingredient_amounts(ingredient_ids, batch_size=10000):
+    """Give every synthetic recipe without ingredients some of them."""
+    weights = get_ingredient_weights(ingredient_ids)
+    recipe_ids = get_benchmark_recipes().filter(
+        ingredient_amounts__isnull=True
+    ).values_list('pk', flat=True)
+    batch = []
+    for recipe_id in recipe_ids.iterator():
+        rand = random.Random(recipe_id)
+        for ingredient_id in pick_ingredients(
+            rand, ingredient_ids, weights,
+            min(get_ingredients_count(rand), len(ingredient_ids))
+        ):
+            batch.append(IngredientAmount(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=rand.randint(1, 500)
+            ))
+        if len(batch) >= batch_size:
+            IngredientAmount.objects.bulk_create(batch)
+            batch = []
+    IngredientAmount.objects.bulk_create(batch)
+
+
+def get_benchmark_tags(count):
+    """Return ids of synthetic tags, creating missing ones."""
+    author = get_benchmark_user()
+    Tag.objects.bulk_create(
+        [
+            Tag(
+                name=f'{BENCHMARK_PREFIX}-tag-{number}',
+                slug=f'{BENCHMARK_PREFIX}-tag-{number}',
+                color=f'#{number:06x}',
+                author=author,
+                last_editor=author,
+            )
+            for number in range(count)
+        ],
+        ignore_conflicts=True
+    )
+    return list(Tag.objects.filter(
+        slug__startswith=f'{BENCHMARK_PREFIX}-tag-'
+    ).order_by('pk').values_list('pk', flat=True)[:count])
+
+
+def seed_recipe_tags(tag_ids, batch_size=10000):
+    """Give every synthetic recipe without tags one or two of them."""
+    through = Recipe.tags.through
+    recipe_ids = get_benchmark_recipes().filter(
+        tags__isnull=True
+    ).values_list('pk', flat=True)
+    batch = []
+    for recipe_id in recipe_ids.iterator():
+        rand = random.Random(recipe_id)
+        for tag_id in set(rand.choices(tag_ids, k=2)):
+            batch.append(through(recipe_id=recipe_id, tag_id=tag_id))
+        if len(batch) >= batch_size:
+            through.objects.bulk_create(batch)
+            batch = []
+    through.objects.bulk_create(batch)
+
+
+def get_benchmark_users(count):
+    """Return synthetic users by number, creating missing ones."""
+    usernames = [
+        f'{BENCHMARK_PREFIX}-user-{number}' for number in range(count)
+    ]
+    User.objects.bulk_create(
+        [
+            User(
+                username=username,
+                email=f'{username}@example.com',
+                first_name='Benchmark',
+                last_name=str(number),
+            )
+            for number, username in enumerate(usernames)
+        ],
+        ignore_conflicts=True
+    )
+    users = User.objects.in_bulk(usernames, field_name='username')
+    return [users[username] for username in usernames]
+
+
+def seed_user_relations(user_ids, favourites, carts, subscriptions,
+                        batch_size=10000):
+    """
+    Give synthetic users favourites and shopping lists of
+    as many random recipes and subscriptions to other users.
+    """
+    recipe_ids = list(get_benchmark_recipes().values_list('pk', flat=True))
+    relations = {FavouriteList: [], ShoppingList: [], Subscription: []}
+    for user_id in user_ids:
+        rand = random.Random(user_id)
+        for model, count in (
+            (FavouriteList, favourites),
+            (ShoppingList, carts),
+        ):
+            relations[model].extend(
+                model(user_id=user_id, recipe_id=recipe_id)
+                for recipe_id in rand.sample(
+                    recipe_ids, min(count, len(recipe_ids))
+                )
+            )
+        relations[Subscription].extend(
+            Subscription(user_id=user_id, author_id=author_id)
+            for author_id in rand.sample(
+                user_ids, min(subscriptions + 1, len(user_ids))
+            )[:subscriptions]
+            if author_id != user_id
+        )
+    for model, items in relations.items():
+        model.objects.bulk_create(
+            items, batch_size=batch_size, ignore_conflicts=True
+        )
+
+
+def seed(recipes, ingredients=1000, tags=10, users=100, authors=20,
+         favourites=20, carts=5, subscriptions=20, catalog=None):
+    """
+    Fill the database with synthetic users, recipes by the first
+    authors of them, their ingredients, tags and user relations,
+    skipping what already exists. Ingredients are read from
+    the catalog csv file when given.
+    """
+    benchmark_users = get_benchmark_users(max(users, authors, 1))
+    create_recipes(recipes, benchmark_users[:max(authors, 1)])
+    seed_ingredient_amounts(
+        get_catalog_ingredients(catalog, ingredients) if catalog
+        else get_benchmark_ingredients(ingredients)
+    )
+    seed_recipe_tags(get_benchmark_tags(tags))
+    user_ids = [user.pk for user in benchmark_users[:users]]
+    seed_user_relations(user_ids, favourites, carts, subscriptions)
+    rebuild_shopping_cart_totals(user_ids)
+    reconcile_counters()
+    cache.invalidate('recipes', 'ingredients', 'tags')
+
+
+def measure(func, repeat):
+    """Call func repeatedly and return timings in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def percentile(timings, share):
+    """Return linearly interpolated percentile of sorted timings."""
+    position = (len(timings) - 1) * share
+    lower = int(position)
+    upper = min(lower + 1, len(timings) - 1)
+    return timings[lower] + (timings[upper] - timings[lower]) * (
+        position - lower
+    )
+
+
+def summarize(timings):
+    """Return p50/p95/p99 of timings in milliseconds."""
+    timings = sorted(timings)
+    return {
+        name: percentile(timings, share)
+        for name, share in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+    }
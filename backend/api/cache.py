@@ -0,0 +1,136 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from core.db import has_replica
+
+STATS_KEY = 'response-cache:stats:{}'
+VERSION_KEY = 'response-cache:version:{}'
+CHANGED_KEY = 'response-cache:changed:{}'
+
+# backends keeping entries in the memory of every process
+LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+LOCAL_WARNING = (
+    'кеш ответов хранится в памяти процесса, запущенный сервер '
+    'не увидит сброс кеша и счетчики этой команды'
+)
+
+
+def get_cache():
+    """Return cache used for responses."""
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def is_shared():
+    """
+    Tell whether cached responses, namespace versions and stats
+    are shared by all processes.
+    """
+    backend = settings.CACHES[settings.RESPONSE_CACHE_ALIAS]['BACKEND']
+    return backend not in LOCAL_BACKENDS
+
+
+def increment(key):
+    """Increment counter in the cache, creating it if needed."""
+    cache = get_cache()
+    cache.add(key, 0, None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+        return 1
+
+
+def get_namespace_version(namespace):
+    """Return current version of cached responses in namespace."""
+    cache = get_cache()
+    key = VERSION_KEY.format(namespace)
+    version = cache.get(key)
+    if version is not None:
+        return version
+    cache.add(key, 1, None)
+    return cache.get(key, 1)
+
+
+def mark_changed(name):
+    """With a replica, mark name changed for REPLICA_LAG_SECONDS."""
+    if has_replica():
+        get_cache().set(
+            CHANGED_KEY.format(name), True, settings.REPLICA_LAG_SECONDS
+        )
+
+
+def invalidate(*namespaces):
+    """
+    Make all cached responses of given namespaces stale
+    and mark them changed.
+    """
+    for namespace in namespaces:
+        increment(VERSION_KEY.format(namespace))
+        mark_changed(namespace)
+
+
+def get_user_key(user_id):
+    """Return name marked on changes of the user's relations."""
+    return f'user:{user_id}'
+
+
+def is_recently_changed(name):
+    """
+    Tell whether the replica may still lack the last change
+    of a namespace or user, then responses have to be read
+    from the primary.
+    """
+    return get_cache().get(CHANGED_KEY.format(name), False)
+
+
+def get_or_build(namespace, name, build):
+    """
+    Return value cached under name for the current namespace version,
+    calling build on a miss.
+    """
+    cache = get_cache()
+    key = f'{namespace}:{get_namespace_version(namespace)}:{name}'
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, settings.RESPONSE_CACHE_TIMEOUT)
+    return value
+
+
+def make_key(namespace, request):
+    """
+    Build cache key from namespace version, path, accepted media type
+    and query params normalized by order.
+    """
+    params = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in sorted(values)
+    )
+    raw = '|'.join((
+        str(get_namespace_version(namespace)),
+        request.path,
+        getattr(request, 'accepted_media_type', '') or '',
+        urlencode(params),
+    ))
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'response-cache:{namespace}:{digest}'
+
+
+def record(hit):
+    """Count cache hit or miss."""
+    increment(STATS_KEY.format('hits' if hit else 'misses'))
+
+
+def get_stats():
+    """Return cache hit and miss counters."""
+    cache = get_cache()
+    return {
+        name: cache.get(STATS_KEY.format(name), 0)
+        for name in ('hits', 'misses')
+    }
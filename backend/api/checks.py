@@ -0,0 +1,37 @@
+import os
+
+from django.core.checks import Error, Tags, Warning, register
+
+from .cache import is_shared
+
+
+@register(Tags.caches)
+def check_response_cache(app_configs, **kwargs):
+    """
+    A process-local response cache is stale in every worker
+    but the one handling a write.
+    """
+    if is_shared():
+        return []
+    if int(os.getenv('WEB_CONCURRENCY', 1)) > 1:
+        return [Error(
+            'кеш ответов хранится в памяти процесса, а процессов '
+            'WEB_CONCURRENCY больше одного',
+            hint='укажите общий CACHE_BACKEND, например DatabaseCache '
+                 'или Memcached',
+            id='api.E001',
+        )]
+    return []
+
+
+@register(Tags.caches, deploy=True)
+def check_response_cache_deploy(app_configs, **kwargs):
+    if is_shared():
+        return []
+    return [Warning(
+        'кеш ответов хранится в памяти процесса, сервер с несколькими '
+        'процессами и команды управления видят разные кеши',
+        hint='укажите общий CACHE_BACKEND, например DatabaseCache '
+             'или Memcached',
+        id='api.W001',
+    )]
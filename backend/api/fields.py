@@ -1,23 +1,142 @@
 import base64
+import binascii
 import uuid
+from io import BytesIO
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            TemporaryUploadedFile)
+from PIL import Image, ImageFile
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from .images import get_variant_url
+
+# multiple of 4 so that every chunk is valid base64 on its own
+BASE64_CHUNK_SIZE = 64 * 1024
 
 
 class Base64ImageField(serializers.ImageField):
-    """Custom field to convert Base64 string to file."""
+    """
+    Custom field to convert Base64 string to file.
+    Represented by the url of given image variant when it is ready.
+    """
+
+    default_error_messages = {
+        'too_large': 'Размер картинки больше {max_size} байт.',
+        'too_many_pixels': 'Картинка больше {max_pixels} пикселей.',
+    }
+
+    def __init__(self, variant=None, **kwargs):
+        self.variant = variant
+        super().__init__(**kwargs)
+
+    def decode(self, data, start):
+        """
+        Decode base64 payload chunk by chunk into an upload file,
+        which is kept in memory only while it is small.
+        """
+        max_size = settings.MAX_IMAGE_UPLOAD_SIZE
+        estimated_size = (len(data) - start) // 4 * 3
+        if estimated_size > max_size + 2:
+            self.fail('too_large', max_size=max_size)
+        if estimated_size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            upload = TemporaryUploadedFile('upload', None, 0, None)
+        else:
+            upload = InMemoryUploadedFile(
+                BytesIO(), None, 'upload', None, 0, None
+            )
+        try:
+            image, upload.size = self.write_chunks(data, start, upload)
+        except serializers.ValidationError:
+            upload.close()
+            raise
+        upload.seek(0)
+        upload.name = f'{uuid.uuid4()}.{image.format.lower()}'
+        upload.content_type = Image.MIME.get(image.format)
+        return upload
+
+    def write_chunks(self, data, start, upload):
+        """
+        Write decoded chunks to upload, checking image header and
+        dimensions as soon as they arrive. Return image and size.
+        """
+        max_size = settings.MAX_IMAGE_UPLOAD_SIZE
+        parser = ImageFile.Parser()
+        size = 0
+        try:
+            for offset in range(start, len(data), BASE64_CHUNK_SIZE):
+                chunk = base64.b64decode(
+                    data[offset:offset + BASE64_CHUNK_SIZE], validate=True
+                )
+                size += len(chunk)
+                if size > max_size:
+                    self.fail('too_large', max_size=max_size)
+                if parser.image is None:
+                    parser.feed(chunk)
+                    if parser.image is not None:
+                        self.check_dimensions(parser.image)
+                upload.write(chunk)
+        except (binascii.Error, OSError, ValueError):
+            self.fail('invalid_image')
+        if parser.image is None:
+            self.fail('invalid_image')
+        return parser.image, size
+
+    def check_dimensions(self, image):
+        max_pixels = settings.MAX_IMAGE_PIXELS
+        width, height = image.size
+        if width * height > max_pixels:
+            self.fail('too_many_pixels', max_pixels=max_pixels)
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            id = uuid.uuid4()
-            data = ContentFile(
-                base64.b64decode(imgstr),
-                name=id.urn[9:] + '.' + ext
-            )
+            start = data.find(';base64,')
+            if start == -1:
+                self.fail('invalid_image')
+            data = self.decode(data, start + len(';base64,'))
         return super(Base64ImageField, self).to_internal_value(data)
 
     def to_representation(self, value):
-        return self.context.get('request').build_absolute_uri(value.url)
+        variant = self.variant or self.context.get('image_variant')
+        url = get_variant_url(value, variant) if variant else value.url
+        return self.context.get('request').build_absolute_uri(url)
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Many related field resolving all primary keys with one query."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        child = self.child_relation
+        queryset = child.get_queryset()
+        pk_field = queryset.model._meta.pk
+        pks = []
+        for item in data:
+            if isinstance(item, bool):
+                child.fail('incorrect_type', data_type=type(item).__name__)
+            try:
+                pks.append(pk_field.to_python(item))
+            except ValidationError:
+                child.fail('incorrect_type', data_type=type(item).__name__)
+        objects = queryset.in_bulk(pks)
+        for pk in pks:
+            if pk not in objects:
+                child.fail('does_not_exist', pk_value=pk)
+        return [objects[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key related field, with many=True fetched in bulk."""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
@@ -1,5 +1,44 @@
+from django.db.models import Exists, OuterRef
 from django_filters import FilterSet, filters
-from foodgram.models import Ingredient, Recipe
+from django_filters.fields import MultipleChoiceField
+from foodgram.models import POPULAR_ORDERING, Ingredient, Recipe, Tag
+
+from . import cache
+from .search import search_recipes
+
+
+def get_tag_map():
+    """Return {slug: id} of all tags, cached until tags change."""
+    return cache.get_or_build(
+        'tags', 'slug-map', lambda: dict(Tag.objects.values_list('slug', 'id'))
+    )
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tag_map()]
+
+
+def is_new_tag(slug):
+    """
+    Check a slug missing from the map in the database and drop
+    the map if the tag is there: tags created by other processes
+    or commands do not invalidate the cache of this one.
+    """
+    if not Tag.objects.filter(slug=slug).exists():
+        return False
+    cache.invalidate('tags')
+    return True
+
+
+class TagSlugField(MultipleChoiceField):
+    """Field accepting tags missing from a stale cached map."""
+
+    def valid_value(self, value):
+        return super().valid_value(value) or is_new_tag(value)
+
+
+class TagsFilter(filters.MultipleChoiceFilter):
+    field_class = TagSlugField
 
 
 class IngredientFilter(FilterSet):
@@ -15,15 +54,36 @@ class IngredientFilter(FilterSet):
 class RecipeFilter(FilterSet):
     """Filters for recipe view."""
 
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = TagsFilter(choices=get_tag_choices, method='get_tags')
     is_favorited = filters.NumberFilter(method='get_is_favorited')
     is_in_shopping_cart = filters.NumberFilter(
         method='get_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='get_search')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'по популярности'),),
+        method='get_ordering'
+    )
 
     class Meta:
         model = Recipe
-        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart']
+        fields = [
+            'author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+            'search', 'ordering'
+        ]
+
+    def get_tags(self, queryset, name, value):
+        """
+        Keep recipes having any of the tags, EXISTS instead of a join
+        does not duplicate recipes and needs no DISTINCT.
+        """
+        tag_map = get_tag_map()
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'),
+                tag_id__in=[tag_map[slug] for slug in value if slug in tag_map]
+            )
+        ))
 
     def get_is_favorited(self, queryset, name, value):
         if not value or value is None:
@@ -40,3 +100,9 @@ class RecipeFilter(FilterSet):
             return queryset.filter(
                 foodgram_shoppinglist_recipes__user=self.request.user
             )
+
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def get_ordering(self, queryset, name, value):
+        return queryset.order_by(*POPULAR_ORDERING)
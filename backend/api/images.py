@@ -0,0 +1,119 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from foodgram.models import Recipe
+from PIL import Image
+
+from . import cache
+
+VARIANTS_DIR = 'recipes/variants/'
+
+
+def render_variant(source, size, image_format, quality):
+    """Return resized copy of an open image encoded to given format."""
+    image = source.copy()
+    if size:
+        image.thumbnail(size)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    output = BytesIO()
+    image.save(output, format=image_format, quality=quality)
+    return output.getvalue()
+
+
+def get_variant_path(image_name, name, image_format):
+    """Return storage path of named variant of an image."""
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'{VARIANTS_DIR}{stem}_{name}.{image_format.lower()}'
+
+
+def generate_variants(recipe_id, image_name):
+    """
+    Create configured variants of recipe image and save their paths,
+    unless the image was replaced in the meantime.
+    """
+    close_old_connections()
+    try:
+        variants = {'source': image_name}
+        with default_storage.open(image_name) as file:
+            with Image.open(file) as source:
+                source.load()
+                for name, options in settings.RECIPE_IMAGE_VARIANTS.items():
+                    content = render_variant(
+                        source, options.get('size'), options['format'],
+                        options.get('quality', 80)
+                    )
+                    variants[name] = default_storage.save(
+                        get_variant_path(image_name, name, options['format']),
+                        ContentFile(content)
+                    )
+        old_variants = Recipe.objects.filter(
+            pk=recipe_id
+        ).values_list('image_variants', flat=True).first() or {}
+        updated = Recipe.objects.filter(
+            pk=recipe_id, image=image_name
+        ).update(image_variants=variants, date_modified=timezone.now())
+        if updated:
+            cache.invalidate('recipes')
+            stale = [
+                path for name, path in old_variants.items()
+                if name != 'source' and path not in variants.values()
+            ]
+        else:
+            stale = [
+                path for name, path in variants.items() if name != 'source'
+            ]
+        for path in stale:
+            default_storage.delete(path)
+    finally:
+        close_old_connections()
+
+
+class SyncImageBackend:
+    """Generate image variants right away in the calling thread."""
+
+    def submit(self, func, *args):
+        func(*args)
+
+
+class ThreadPoolImageBackend:
+    """Generate image variants in a local pool of worker threads."""
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PIPELINE_WORKERS,
+            thread_name_prefix='image-pipeline'
+        )
+
+    def submit(self, func, *args):
+        self.executor.submit(func, *args)
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    """Return configured image pipeline backend instance."""
+    return import_string(settings.IMAGE_PIPELINE_BACKEND)()
+
+
+def schedule_variants(recipe):
+    """Queue variant generation once the recipe is committed."""
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    transaction.on_commit(
+        lambda: get_backend().submit(generate_variants, recipe_id, image_name)
+    )
+
+
+def get_variant_url(image, variant):
+    """Return url of an image variant, or of the original image."""
+    variants = getattr(image.instance, 'image_variants', None) or {}
+    if variants.get('source') == image.name and variant in variants:
+        return default_storage.url(variants[variant])
+    return image.url
@@ -0,0 +1,69 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from foodgram.models import Ingredient
+
+
+class IngredientIndex:
+    """
+    In-memory sorted index over the ingredient catalog
+    to answer name autocomplete queries without the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._built_at = 0.0
+
+    def invalidate(self):
+        """Drop the index, it is rebuilt on the next search."""
+        self._data = None
+
+    def build(self):
+        """Load the catalog and sort it by case-folded name."""
+        rows = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda row: (row['name'].casefold(), row['id'])
+        )
+        keys = [row['name'].casefold() for row in rows]
+        self._data = (keys, rows)
+        self._built_at = time.monotonic()
+        return self._data
+
+    def _get_data(self):
+        data = self._data
+        ttl = settings.INGREDIENT_INDEX_TTL
+        if data is not None and time.monotonic() - self._built_at < ttl:
+            return data
+        with self._lock:
+            if self._data is not None and self._data is not data:
+                return self._data
+            return self.build()
+
+    def search(self, query, limit=None):
+        """
+        Return ingredients whose name starts with the query,
+        followed by those containing it, at most limit items.
+        """
+        if limit is None:
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        keys, rows = self._get_data()
+        query = query.strip().casefold()
+        result = []
+        position = bisect_left(keys, query)
+        while (position < len(keys) and len(result) < limit
+               and keys[position].startswith(query)):
+            result.append(rows[position])
+            position += 1
+        if len(result) < limit:
+            for key, row in zip(keys, rows):
+                if query in key and not key.startswith(query):
+                    result.append(row)
+                    if len(result) == limit:
+                        break
+        return result
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,352 @@
+import base64
+import io
+import itertools
+import json
+import platform
+import subprocess
+import time
+from collections import namedtuple
+from contextlib import nullcontext
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from foodgram.models import IngredientAmount, Recipe, ShoppingList, Tag
+from PIL import Image
+from rest_framework.test import APIClient
+from api import cache
+from api.benchmarks import (BENCHMARK_PREFIX, get_benchmark_recipes,
+                            get_benchmark_user, summarize)
+from api.images import get_variant_path
+
+PASSWORD = 'benchmark-password'
+
+User = get_user_model()
+
+Scenario = namedtuple(
+    'Scenario',
+    'name method url data user status setup cleanup',
+    defaults=(None, None, 200, None, None)
+)
+
+
+def get_image():
+    """Return small png image as a data url."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), 'white').save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+def get_commit():
+    """Return current git commit of the code or None."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, check=True,
+            text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    """Measure every api route on seeded data."""
+
+    help = (
+        'Run scripted requests against every api route and report '
+        'query counts, p50/p95/p99 latency and throughput, '
+        'run seed_benchmark_data first'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--warm-cache', action='store_true',
+            help='keep cached responses between requests'
+        )
+        parser.add_argument(
+            '--only', nargs='+', default=[],
+            help='run scenarios with names containing any of these words'
+        )
+        parser.add_argument(
+            '--skip', nargs='+', default=[],
+            help='skip scenarios with names containing any of these words'
+        )
+        parser.add_argument('--output', help='save results as json')
+        parser.add_argument(
+            '--compare', help='json results of another run to compare with'
+        )
+
+    def get_scenarios(self):
+        user = get_benchmark_user(0)
+        if not user.check_password(PASSWORD):
+            user.set_password(PASSWORD)
+            user.save(update_fields=['password'])
+        other = User.objects.filter(
+            username__startswith=f'{BENCHMARK_PREFIX}-user-'
+        ).exclude(pk=user.pk).exclude(following__user=user).first()
+        if other is None:
+            raise CommandError('нет автора, на которого нет подписки')
+        recipes = get_benchmark_recipes()
+        recipe = recipes.filter(author=user).latest('pk')
+        free_recipe = recipes.exclude(
+            foodgram_favouritelist_recipes__user=user
+        ).exclude(foodgram_shoppinglist_recipes__user=user).latest('pk')
+        if not ShoppingList.objects.filter(user=user).exists():
+            raise CommandError('у пользователя нет списка покупок')
+        tag = recipe.tags.first() or Tag.objects.first()
+        amounts = list(IngredientAmount.objects.filter(
+            recipe=recipe
+        ).values_list('ingredient_id', 'amount'))
+        updates = itertools.count()
+        recipe_data = {
+            'tags': [tag.pk],
+            'ingredients': [
+                {'id': ingredient_id, 'amount': amount}
+                for ingredient_id, amount in amounts
+            ],
+            'image': get_image(),
+            'text': 'Benchmark recipe.',
+            'cooking_time': 10,
+        }
+
+        def new_recipe():
+            return {
+                **recipe_data,
+                'name': f'{BENCHMARK_PREFIX}-api-{time.time_ns()}',
+            }
+
+        def updated_recipe():
+            shift = next(updates) % 2
+            return {
+                'ingredients': [
+                    {'id': ingredient_id, 'amount': amount + shift}
+                    for ingredient_id, amount in amounts
+                ],
+                'tags': [tag.pk],
+                'cooking_time': 10 + shift,
+            }
+
+        def delete_recipe(response):
+            """
+            Delete created recipe, then its image files: variants
+            still being generated are dropped once the recipe is gone.
+            """
+            created = Recipe.objects.get(pk=response.data['id'])
+            image_name = created.image.name
+            created.delete()
+            default_storage.delete(image_name)
+            for name, options in settings.RECIPE_IMAGE_VARIANTS.items():
+                default_storage.delete(
+                    get_variant_path(image_name, name, options['format'])
+                )
+
+        def call(method, url):
+            """Undo or prepare a scenario through the api itself."""
+            return lambda *args: self.request(
+                Scenario(method, method, url, user=user)
+            )
+
+        favourite_url = f'/api/recipes/{free_recipe.pk}/favorite/'
+        cart_url = f'/api/recipes/{free_recipe.pk}/shopping_cart/'
+        subscribe_url = f'/api/users/{other.pk}/subscribe/'
+        ingredients = [ingredient_id for ingredient_id, _ in amounts]
+        return [
+            Scenario('tags', 'get', '/api/tags/'),
+            Scenario('ingredients', 'get', '/api/ingredients/'),
+            Scenario(
+                'ingredient search', 'get', '/api/ingredients/',
+                {'name': 'сах'}
+            ),
+            Scenario('recipe feed', 'get', '/api/recipes/'),
+            Scenario('recipe feed as user', 'get', '/api/recipes/', user=user),
+            Scenario(
+                'recipe feed cursor', 'get', '/api/recipes/',
+                {'pagination': 'cursor'}
+            ),
+            Scenario(
+                'recipes by tag', 'get', '/api/recipes/', {'tags': tag.slug}
+            ),
+            Scenario(
+                'recipes by author', 'get', '/api/recipes/',
+                {'author': other.pk}
+            ),
+            Scenario(
+                'favourite recipes', 'get', '/api/recipes/',
+                {'is_favorited': 1}, user
+            ),
+            Scenario(
+                'shopping cart recipes', 'get', '/api/recipes/',
+                {'is_in_shopping_cart': 1}, user
+            ),
+            Scenario(
+                'popular recipes', 'get', '/api/recipes/',
+                {'ordering': 'popular'}
+            ),
+            Scenario(
+                'recipe search', 'get', '/api/recipes/', {'search': 'recipe'}
+            ),
+            Scenario(
+                'pantry', 'get', '/api/recipes/pantry/',
+                {'ingredients': ingredients}
+            ),
+            Scenario('recipe', 'get', f'/api/recipes/{recipe.pk}/', user=user),
+            Scenario(
+                'recipe create', 'post', '/api/recipes/', new_recipe, user,
+                201, cleanup=delete_recipe
+            ),
+            Scenario(
+                'recipe update', 'patch', f'/api/recipes/{recipe.pk}/',
+                updated_recipe, user
+            ),
+            Scenario(
+                'favourite add', 'post', favourite_url, user=user,
+                status=201, cleanup=call('delete', favourite_url)
+            ),
+            Scenario(
+                'favourite remove', 'delete', favourite_url, user=user,
+                status=204, setup=call('post', favourite_url)
+            ),
+            Scenario(
+                'shopping cart add', 'post', cart_url, user=user,
+                status=201, cleanup=call('delete', cart_url)
+            ),
+            Scenario(
+                'shopping cart remove', 'delete', cart_url, user=user,
+                status=204, setup=call('post', cart_url)
+            ),
+            Scenario(
+                'shopping cart download', 'get',
+                '/api/recipes/download_shopping_cart/', user=user
+            ),
+            Scenario('users', 'get', '/api/users/', user=user),
+            Scenario('user', 'get', f'/api/users/{other.pk}/', user=user),
+            Scenario(
+                'subscriptions', 'get', '/api/users/subscriptions/',
+                {'recipes_limit': 3}, user
+            ),
+            Scenario(
+                'subscribe', 'post', subscribe_url, user=user, status=201,
+                cleanup=call('delete', subscribe_url)
+            ),
+            Scenario(
+                'unsubscribe', 'delete', subscribe_url, user=user,
+                status=204, setup=call('post', subscribe_url)
+            ),
+            Scenario(
+                'token login', 'post', '/api/auth/token/login/',
+                {'email': user.email, 'password': PASSWORD}
+            ),
+        ]
+
+    def request(self, scenario):
+        client = APIClient()
+        if scenario.user is not None:
+            client.force_authenticate(scenario.user)
+        data = scenario.data() if callable(scenario.data) else scenario.data
+        response = getattr(client, scenario.method)(
+            scenario.url, data,
+            format=None if scenario.method == 'get' else 'json',
+            HTTP_HOST=settings.ALLOWED_HOSTS[0]
+        )
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def run(self, scenario, warm_cache, count_queries=False):
+        """
+        Call scenario once and return seconds spent in the request
+        and number of queries it made when asked to count them.
+        """
+        if scenario.setup is not None:
+            scenario.setup()
+        if not warm_cache:
+            cache.invalidate('recipes', 'ingredients', 'tags')
+        context = CaptureQueriesContext(connection)
+        with context if count_queries else nullcontext():
+            start = time.perf_counter()
+            response = self.request(scenario)
+            elapsed = time.perf_counter() - start
+        queries = len(context) if count_queries else None
+        if response.status_code != scenario.status:
+            raise CommandError(
+                f'{scenario.name}: status {response.status_code}, '
+                f'{getattr(response, "data", "")}'
+            )
+        if scenario.cleanup is not None:
+            scenario.cleanup(response)
+        return elapsed, queries
+
+    def measure(self, scenario, options):
+        warm_cache = options['warm_cache']
+        for _ in range(options['warmup']):
+            self.run(scenario, warm_cache)
+        _, queries = self.run(scenario, warm_cache, count_queries=True)
+        timings = [
+            self.run(scenario, warm_cache)[0]
+            for _ in range(options['repeat'])
+        ]
+        result = summarize([timing * 1000 for timing in timings])
+        result['queries'] = queries
+        result['throughput'] = len(timings) / sum(timings)
+        return result
+
+    def compare(self, results, path):
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)
+        self.stdout.write(
+            f'\ncompared with {baseline.get("commit") or path}:'
+        )
+        for name, result in results.items():
+            old = baseline['scenarios'].get(name)
+            if old is None:
+                continue
+            change = (result['p50'] - old['p50']) / old['p50'] * 100
+            self.stdout.write(
+                f'{name:>24}: p50 {old["p50"]:.2f} -> {result["p50"]:.2f} ms '
+                f'({change:+.0f}%), queries {old["queries"]} -> '
+                f'{result["queries"]}'
+            )
+
+    def handle(self, *args, **options):
+        if not get_benchmark_recipes().exists():
+            raise CommandError('нет данных, запустите seed_benchmark_data')
+        results = {}
+        for scenario in self.get_scenarios():
+            if options['only'] and not any(
+                word in scenario.name for word in options['only']
+            ) or any(word in scenario.name for word in options['skip']):
+                continue
+            result = results[scenario.name] = self.measure(scenario, options)
+            self.stdout.write(
+                f'{scenario.name:>24}: {result["queries"]:>3} queries '
+                f'p50={result["p50"]:.2f} ms p95={result["p95"]:.2f} ms '
+                f'p99={result["p99"]:.2f} ms '
+                f'{result["throughput"]:.0f} req/s'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'commit': get_commit(),
+                    'date': timezone.now().isoformat(),
+                    'database': connection.vendor,
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'options': {
+                        key: options[key]
+                        for key in ('repeat', 'warmup', 'warm_cache')
+                    },
+                    'recipes': Recipe.objects.count(),
+                    'users': User.objects.count(),
+                    'scenarios': results,
+                }, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            self.compare(results, options['compare'])
@@ -0,0 +1,55 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from foodgram.models import Ingredient
+from api.benchmarks import summarize
+from api.fitlers import IngredientFilter
+from api.ingredient_index import ingredient_index
+from api.serializers import IngredientSerializer
+
+
+class Command(BaseCommand):
+    """Compare ingredient autocomplete latency: ORM filter vs index."""
+
+    help = 'Benchmark ingredient name search: ORM path vs in-memory index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def measure(self, func, queries):
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            func(query)
+            timings.append((time.perf_counter() - start) * 1000)
+        percentiles = summarize(timings)
+        return percentiles['p50'], percentiles['p99']
+
+    def orm_search(self, query):
+        queryset = IngredientFilter(
+            {'name': query}, queryset=Ingredient.objects.all()
+        ).qs
+        return IngredientSerializer(queryset, many=True).data
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            self.stderr.write('Каталог ингредиентов пуст.')
+            return
+        rnd = random.Random(options['seed'])
+        queries = [
+            rnd.choice(names)[:rnd.randint(1, 4)]
+            for _ in range(options['queries'])
+        ]
+        ingredient_index.build()
+        for title, func in (
+            ('orm', self.orm_search),
+            ('index', ingredient_index.search),
+        ):
+            p50, p99 = self.measure(func, queries)
+            self.stdout.write(
+                f'{title:>6}: p50={p50:.3f} ms p99={p99:.3f} ms '
+                f'({len(names)} ingredients, {len(queries)} queries)'
+            )
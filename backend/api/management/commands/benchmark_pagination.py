@@ -0,0 +1,103 @@
+from urllib.parse import parse_qs, urlparse
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from foodgram.models import Recipe
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIClient
+from core.pagination import GeneralCursorPagination
+from api import cache
+from api.benchmarks import create_recipes, measure, summarize
+
+URL = '/api/recipes/'
+
+
+class Command(BaseCommand):
+    """Compare page number and keyset pagination on deep pages."""
+
+    help = (
+        'Benchmark deep page latency of /api/recipes/ with page number '
+        'vs cursor pagination on synthetic recipes, without the cache'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1_000_000)
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--pages', type=int, nargs='+',
+            default=[1, 100, 10_000, 100_000]
+        )
+
+    def get_cursor(self, page, limit):
+        """Encode cursor pointing right after the previous page."""
+        paginator = GeneralCursorPagination()
+        paginator.base_url = URL
+        position = None
+        if page > 1:
+            position = Recipe.objects.order_by(
+                *paginator.ordering
+            ).values_list(
+                'date_modified', flat=True
+            )[(page - 1) * limit - 1]
+        url = paginator.encode_cursor(Cursor(
+            offset=0, reverse=False,
+            position=None if position is None else str(position)
+        ))
+        return parse_qs(urlparse(url).query).get('cursor', [''])[0]
+
+    def get(self, params):
+        """Request the recipe list bypassing cached responses."""
+        cache.invalidate('recipes')
+        response = self.client.get(URL, params)
+        if response.status_code != 200:
+            raise CommandError(f'{URL} {params}: {response.status_code}')
+        return response
+
+    def count_queries(self, params):
+        """Return number of queries and of COUNT queries of a request."""
+        with CaptureQueriesContext(connection) as queries:
+            self.get(params)
+        counts = [
+            query for query in queries.captured_queries
+            if 'COUNT(' in query['sql'].upper()
+        ]
+        return len(queries), len(counts)
+
+    def handle(self, *args, **options):
+        created = create_recipes(options['recipes'])
+        self.stdout.write(f'recipes created: {created}')
+        self.client = APIClient(SERVER_NAME=settings.ALLOWED_HOSTS[0])
+        total = Recipe.objects.count()
+        limit = options['limit']
+        for page in options['pages']:
+            if (page - 1) * limit >= total:
+                continue
+            page_params = {'page': page, 'limit': limit}
+            cursor = self.get_cursor(page, limit)
+            cursor_params = {'pagination': 'cursor', 'limit': limit}
+            if cursor:
+                cursor_params['cursor'] = cursor
+            results = {}
+            for mode, params in (
+                ('page number', page_params), ('cursor', cursor_params)
+            ):
+                queries, counts = self.count_queries(params)
+                timings = summarize(measure(
+                    lambda: self.get(params), options['repeat']
+                ))
+                results[mode] = (
+                    f'{mode} p50={timings["p50"]:.2f} ms '
+                    f'p99={timings["p99"]:.2f} ms '
+                    f'queries={queries} counts={counts}'
+                )
+                if mode == 'cursor' and counts:
+                    raise CommandError(
+                        f'страница {page} в режиме cursor делает COUNT'
+                    )
+            self.stdout.write(
+                f'page {page:>7}: {results["page number"]} | '
+                f'{results["cursor"]}'
+            )
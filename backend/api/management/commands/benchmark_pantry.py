@@ -0,0 +1,88 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.functions import Cast
+from foodgram.models import Recipe
+from api.benchmarks import (create_recipes, get_benchmark_ingredients,
+                            get_ingredient_weights, measure, pick_ingredients,
+                            seed_ingredient_amounts, summarize)
+from api.pantry_index import PantryIndex
+
+
+class Command(BaseCommand):
+    """Compare pantry index matching with the relational query."""
+
+    help = (
+        'Benchmark ranking recipes by ingredients on hand with the '
+        'in-memory pantry index against an aggregate query'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=200_000)
+        parser.add_argument('--ingredients', type=int, default=1000)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--pantry-sizes', type=int, nargs='+', default=[3, 10, 25]
+        )
+
+    def match_with_query(self, ingredient_ids, limit):
+        """Rank recipes by coverage with a single aggregate query."""
+        return [
+            (row['pk'], row['matched'], row['total'])
+            for row in Recipe.objects.annotate(
+                matched=Count(
+                    'ingredient_amounts',
+                    filter=Q(ingredient_amounts__ingredient__in=ingredient_ids)
+                ),
+                total=Count('ingredient_amounts'),
+            ).filter(matched__gt=0).annotate(
+                coverage=Cast(F('matched'), FloatField())
+                / Cast(F('total'), FloatField())
+            ).order_by(
+                '-coverage', '-matched', '-pk'
+            ).values('pk', 'matched', 'total')[:limit]
+        ]
+
+    def handle(self, *args, **options):
+        created = create_recipes(options['recipes'])
+        self.stdout.write(f'recipes created: {created}')
+        ingredient_ids = get_benchmark_ingredients(options['ingredients'])
+        weights = get_ingredient_weights(ingredient_ids)
+        seed_ingredient_amounts(ingredient_ids)
+        index = PantryIndex()
+        start = time.perf_counter()
+        data = index.build()
+        dense = sum(
+            isinstance(posting, int) for posting in data.postings.values()
+        )
+        self.stdout.write(
+            f'index built in {time.perf_counter() - start:.1f} s: '
+            f'{len(data.recipe_ids)} recipes, {len(data.postings)} '
+            f'ingredients, {dense} of them as bitsets'
+        )
+        rand = random.Random(0)
+        limit = options['limit']
+        for size in options['pantry_sizes']:
+            pantry = pick_ingredients(rand, ingredient_ids, weights, size)
+            in_memory = summarize(measure(
+                lambda: index.match(pantry, limit), options['repeat']
+            ))
+            query = summarize(measure(
+                lambda: self.match_with_query(pantry, limit),
+                max(options['repeat'] // 10, 1)
+            ))
+            same = (
+                index.match(pantry, limit)
+                == self.match_with_query(pantry, limit)
+            )
+            self.stdout.write(
+                f'pantry of {size:>3}: '
+                f'index p50={in_memory["p50"]:.2f} ms '
+                f'p99={in_memory["p99"]:.2f} ms | '
+                f'query p50={query["p50"]:.2f} ms '
+                f'p99={query["p99"]:.2f} ms | '
+                f'same ranking: {"yes" if same else "NO"}'
+            )
@@ -0,0 +1,55 @@
+import statistics
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from foodgram.models import Recipe
+from api.benchmarks import summarize
+from api.images import generate_variants
+
+
+class Command(BaseCommand):
+    """Measure image variant generation cost and bytes saved by lists."""
+
+    help = (
+        'Benchmark recipe image variants: generation time moved out of '
+        'requests and image bytes per recipe list page'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=50)
+        parser.add_argument('--page-size', type=int, default=6)
+
+    def handle(self, *args, **options):
+        recipes = list(
+            Recipe.objects.exclude(image='').order_by('-date_modified')
+            .values_list('pk', 'image')[:options['recipes']]
+        )
+        if not recipes:
+            self.stderr.write('Нет рецептов с картинками.')
+            return
+        timings = []
+        for recipe_id, image_name in recipes:
+            start = time.perf_counter()
+            generate_variants(recipe_id, image_name)
+            timings.append((time.perf_counter() - start) * 1000)
+        original_bytes, thumbnail_bytes = [], []
+        for image_name, variants in Recipe.objects.filter(
+            pk__in=[recipe_id for recipe_id, _ in recipes]
+        ).values_list('image', 'image_variants'):
+            original_bytes.append(default_storage.size(image_name))
+            thumbnail_bytes.append(
+                default_storage.size(variants.get('thumbnail', image_name))
+            )
+        page = options['page_size']
+        percentiles = summarize(timings)
+        self.stdout.write(
+            f'variant generation per upload (now off the request path): '
+            f'p50={percentiles["p50"]:.1f} ms '
+            f'p99={percentiles["p99"]:.1f} ms'
+        )
+        self.stdout.write(
+            f'image bytes per list page of {page}: '
+            f'original={statistics.mean(original_bytes) * page:.0f} '
+            f'thumbnail={statistics.mean(thumbnail_bytes) * page:.0f}'
+        )
@@ -0,0 +1,88 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from foodgram.models import Recipe
+from api.benchmarks import BENCHMARK_PREFIX, create_recipes, measure, summarize
+from api.search import (is_full_text_supported, refresh_search_vectors,
+                        search_recipes)
+
+DISHES = (
+    'борщ', 'щи', 'солянка', 'пельмени', 'вареники', 'блины', 'сырники',
+    'плов', 'гуляш', 'котлеты', 'оладьи', 'окрошка', 'рассольник',
+    'запеканка', 'голубцы', 'шарлотка', 'винегрет', 'жаркое',
+)
+WORDS = (
+    'говядина', 'свинина', 'курица', 'картофель', 'капуста', 'свёкла',
+    'морковь', 'лук', 'чеснок', 'сметана', 'творог', 'мука', 'яйца',
+    'молоко', 'рис', 'грибы', 'укроп', 'яблоки', 'томаты', 'перец',
+    'тушить', 'запекать', 'варить', 'жарить', 'подавать', 'горячим',
+)
+
+
+def describe_recipe(number):
+    """Return deterministic pseudo-random dish name and description."""
+    rand = random.Random(number)
+    dish = rand.choice(DISHES)
+    return (
+        f' {dish} {rand.choice(WORDS)}',
+        ' '.join(rand.choices(WORDS, k=30))
+    )
+
+
+class Command(BaseCommand):
+    """Compare recipe full-text search with a naive substring match."""
+
+    help = (
+        'Benchmark recipe search latency on a synthetic corpus '
+        'against icontains over name and description'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=500_000)
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--queries', nargs='+',
+            default=[
+                'борщ', 'шарлотка яблоки', 'вареники яблоки укроп', 'тирамису'
+            ]
+        )
+
+    def handle(self, *args, **options):
+        created = create_recipes(options['recipes'], describe=describe_recipe)
+        self.stdout.write(f'recipes created: {created}')
+        benchmark_recipes = Recipe.objects.filter(
+            name__startswith=f'{BENCHMARK_PREFIX}-recipe-'
+        )
+        if is_full_text_supported():
+            indexed = refresh_search_vectors(
+                benchmark_recipes.filter(search_vector__isnull=True)
+            )
+            self.stdout.write(f'search vectors computed: {indexed}')
+        else:
+            self.stdout.write(
+                'no full-text search on this database, '
+                'measuring the substring fallback'
+            )
+        limit = options['limit']
+        for query in options['queries']:
+            search = summarize(measure(
+                lambda: list(search_recipes(Recipe.objects.all(), query)[
+                    :limit
+                ]),
+                options['repeat']
+            ))
+            naive = summarize(measure(
+                lambda: list(Recipe.objects.filter(
+                    Q(name__icontains=query) | Q(text__icontains=query)
+                )[:limit]),
+                options['repeat']
+            ))
+            self.stdout.write(
+                f'{query!r:>20}: '
+                f'search p50={search["p50"]:.2f} ms '
+                f'p99={search["p99"]:.2f} ms | '
+                f'icontains p50={naive["p50"]:.2f} ms '
+                f'p99={naive["p99"]:.2f} ms'
+            )
@@ -0,0 +1,102 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django_filters import filters
+from foodgram.models import Recipe, Tag
+from rest_framework.request import Request
+from api import cache
+from api.benchmarks import (create_recipes, get_benchmark_tags, measure,
+                            seed_recipe_tags, summarize)
+from api.fitlers import RecipeFilter
+
+
+class JoinRecipeFilter(RecipeFilter):
+    """Previous tag filter joining tags and building choices from them."""
+
+    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+
+
+class Command(BaseCommand):
+    """Compare tag filter on an EXISTS subquery with the join."""
+
+    help = (
+        'Check OR semantics of the recipe tag filter and compare its '
+        'queries and latency with the join based filter'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100_000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def filter(self, filterset_class, slugs, limit):
+        """Return first page and count of filtered recipes."""
+        request = Request(RequestFactory().get(
+            '/api/recipes/', {'tags': slugs}
+        ))
+        filterset = filterset_class(
+            request.query_params,
+            Recipe.objects.order_by('-date_modified', '-id'),
+            request=request
+        )
+        if not filterset.is_valid():
+            raise CommandError(filterset.errors)
+        queryset = filterset.qs
+        return (
+            list(queryset.values_list('pk', flat=True)[:limit]),
+            queryset.count()
+        )
+
+    def check_semantics(self, slugs):
+        """Filtered recipes must be those having any tag, each once."""
+        ids = list(RecipeFilter(
+            {'tags': slugs}, Recipe.objects.all()
+        ).qs.values_list('pk', flat=True))
+        expected = set(Recipe.objects.filter(
+            tags__slug__in=slugs
+        ).values_list('pk', flat=True))
+        return len(ids) == len(set(ids)) and set(ids) == expected
+
+    def handle(self, *args, **options):
+        created = create_recipes(options['recipes'])
+        self.stdout.write(f'recipes created: {created}')
+        seed_recipe_tags(get_benchmark_tags(options['tags']))
+        slugs = list(Tag.objects.filter(
+            pk__in=get_benchmark_tags(options['tags'])
+        ).order_by('pk').values_list('slug', flat=True))
+        rand = random.Random(0)
+        limit = options['limit']
+        for count in (1, 2, 3):
+            picked = rand.sample(slugs, min(count, len(slugs)))
+            same = self.check_semantics(picked)
+            results = []
+            for filterset_class in (RecipeFilter, JoinRecipeFilter):
+                cache.invalidate('tags')
+                with CaptureQueriesContext(connection) as context:
+                    first = self.filter(filterset_class, picked, limit)
+                results.append((
+                    first,
+                    len(context.captured_queries),
+                    summarize(measure(
+                        lambda: self.filter(filterset_class, picked, limit),
+                        options['repeat']
+                    ))
+                ))
+            (exists_page, exists_queries, exists_time), (
+                join_page, join_queries, join_time
+            ) = results
+            self.stdout.write(
+                f'{count} tag(s): '
+                f'exists {exists_queries} queries '
+                f'p50={exists_time["p50"]:.2f} ms '
+                f'p99={exists_time["p99"]:.2f} ms | '
+                f'join {join_queries} queries '
+                f'p50={join_time["p50"]:.2f} ms '
+                f'p99={join_time["p99"]:.2f} ms | '
+                f'any tag, no duplicates: {"yes" if same else "NO"} | '
+                f'same page: {"yes" if exists_page == join_page else "NO"}'
+            )
@@ -0,0 +1,144 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from foodgram.models import Tag
+from rest_framework.test import APIClient
+from api import cache
+from api.benchmarks import (get_benchmark_recipes, get_benchmark_tags,
+                            get_benchmark_user, seed)
+
+
+def get_seq_scans(plan):
+    """Yield relations read by sequential scans anywhere in plan."""
+    if plan.get('Node Type') == 'Seq Scan':
+        yield plan['Relation Name']
+    for subplan in plan.get('Plans', ()):
+        yield from get_seq_scans(subplan)
+
+
+class Command(BaseCommand):
+    """Check query plans of the hot api requests."""
+
+    help = (
+        'Run the hot api requests against the database, EXPLAIN every '
+        'query they make and fail on sequential scans of large tables'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='add synthetic recipes up to this count first'
+        )
+        parser.add_argument(
+            '--min-rows', type=int, default=10_000,
+            help='tables with fewer estimated rows may be scanned'
+        )
+
+    def get_scenarios(self):
+        """Return (name, user, url, params) of the hot requests."""
+        user = get_benchmark_user(0)
+        tag = Tag.objects.get(pk=get_benchmark_tags(1)[0])
+        recipe = get_benchmark_recipes().latest('pk')
+        ingredients = list(
+            recipe.ingredient_amounts.values_list('ingredient', flat=True)
+        )
+        return [
+            ('recipes', None, '/api/recipes/', {}),
+            ('recipes as user', user, '/api/recipes/', {}),
+            ('recipes cursor', None, '/api/recipes/',
+             {'pagination': 'cursor'}),
+            ('recipes by tag', None, '/api/recipes/', {'tags': tag.slug}),
+            ('recipes by author', None, '/api/recipes/',
+             {'author': get_benchmark_user(1).pk}),
+            ('favourite recipes', user, '/api/recipes/',
+             {'is_favorited': 1}),
+            ('shopping cart recipes', user, '/api/recipes/',
+             {'is_in_shopping_cart': 1}),
+            ('popular recipes', None, '/api/recipes/',
+             {'ordering': 'popular'}),
+            ('recipe', user, f'/api/recipes/{recipe.pk}/', {}),
+            ('pantry', None, '/api/recipes/pantry/',
+             {'ingredients': ingredients}),
+            ('users', user, '/api/users/', {}),
+            ('subscriptions', user, '/api/users/subscriptions/',
+             {'recipes_limit': 3}),
+            ('shopping cart download', user,
+             '/api/recipes/download_shopping_cart/', {}),
+        ]
+
+    def get_row_estimates(self, relations):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT relname, reltuples FROM pg_class '
+                'WHERE relname = ANY(%s)', [list(relations)]
+            )
+            return dict(cursor.fetchall())
+
+    def explain(self, sql):
+        """Return plan of captured query, its parameters are inlined."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Plan']
+
+    def run_scenario(self, user, url, params):
+        """Make request and return SELECT queries it ran."""
+        cache.invalidate('recipes', 'ingredients', 'tags')
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(
+                url, params, HTTP_HOST=settings.ALLOWED_HOSTS[0]
+            )
+            if response.streaming:
+                b''.join(response.streaming_content)
+        if response.status_code != 200:
+            raise CommandError(f'{url}: status {response.status_code}')
+        return [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].lstrip().upper().startswith('SELECT')
+        ]
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('нужна база данных PostgreSQL')
+        if options['seed']:
+            seed(options['seed'])
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM ANALYZE')
+        violations = 0
+        for name, user, url, params in self.get_scenarios():
+            queries = self.run_scenario(user, url, params)
+            scans = []
+            for sql in queries:
+                plan = self.explain(sql)
+                scans.extend(
+                    (relation, sql) for relation in get_seq_scans(plan)
+                )
+            estimates = self.get_row_estimates(
+                {relation for relation, _ in scans}
+            )
+            large = [
+                (relation, sql) for relation, sql in scans
+                if estimates.get(relation, 0) >= options['min_rows']
+            ]
+            violations += len(large)
+            self.stdout.write(
+                f'{name}: {len(queries)} queries, '
+                f'{len(large) or "no"} large sequential scans'
+            )
+            for relation, sql in large:
+                self.stdout.write(
+                    f'  seq scan on {relation} '
+                    f'(~{int(estimates[relation])} rows): {sql[:300]}'
+                )
+        if violations:
+            raise CommandError(
+                f'sequential scans of large tables: {violations}'
+            )
@@ -0,0 +1,44 @@
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from foodgram.models import Recipe
+from api.archive import write_archive
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Export recipes to an archive for another instance."""
+
+    help = (
+        'Write recipes with tags, ingredient amounts and image names '
+        'as newline delimited json, image files are not included'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='archive file, - for stdout')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--author', nargs='+', default=[],
+            help='export only recipes of these usernames'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Recipe.objects.all()
+        if options['author']:
+            queryset = queryset.filter(author__username__in=options['author'])
+        start = time.perf_counter()
+        if options['path'] == '-':
+            written = write_archive(
+                sys.stdout, queryset, options['batch_size']
+            )
+        else:
+            with open(options['path'], 'w', encoding='utf-8') as file:
+                written = write_archive(file, queryset, options['batch_size'])
+        elapsed = time.perf_counter() - start
+        self.stderr.write(
+            f'recipes: {written}, '
+            f'{written / elapsed if elapsed else 0:.0f} recipes/s'
+        )
@@ -0,0 +1,67 @@
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from core.exceptions import InvalidRecipeArchiveError
+from api import cache
+from api.archive import RecipeImporter, read_archive
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Import recipes from an archive made by export_recipes."""
+
+    help = (
+        'Insert recipes from an export_recipes archive in batches, '
+        'recipes with existing names are skipped, image files '
+        'have to be copied to media separately'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='archive file, - for stdin')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--user',
+            help='username of the author of recipes by unknown users, '
+                 'new ingredients and tags, first superuser by default'
+        )
+
+    def get_author(self, username):
+        users = User.objects.order_by('pk')
+        if username:
+            author = users.filter(username=username).first()
+        else:
+            author = users.filter(is_superuser=True).first()
+        if author is None:
+            raise CommandError('не найден пользователь - автор по умолчанию')
+        return author
+
+    def handle(self, *args, **options):
+        importer = RecipeImporter(self.get_author(options['user']))
+        start = time.perf_counter()
+        try:
+            if options['path'] == '-':
+                stats = importer.run(
+                    read_archive(sys.stdin), options['batch_size']
+                )
+            else:
+                with open(options['path'], encoding='utf-8') as file:
+                    stats = importer.run(
+                        read_archive(file), options['batch_size']
+                    )
+        except InvalidRecipeArchiveError as e:
+            raise CommandError(
+                f'{e}, импортировано рецептов: {importer.stats["created"]}'
+            )
+        elapsed = time.perf_counter() - start
+        if not cache.is_shared():
+            self.stderr.write(self.style.WARNING(cache.LOCAL_WARNING))
+        self.stdout.write(
+            f'created: {stats["created"]}, skipped: {stats["skipped"]}, '
+            f'reassigned to {importer.default_author.username}: '
+            f'{stats["reassigned"]}, new ingredients: '
+            f'{stats["ingredients"]}, new tags: {stats["tags"]}, '
+            f'{stats["created"] / elapsed if elapsed else 0:.0f} recipes/s'
+        )
@@ -0,0 +1,211 @@
+import csv
+import io
+import itertools
+import json
+import os
+import time
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from foodgram.models import Ingredient
+from api import cache
+
+CHUNK_SIZE = 64 * 1024
+HEADER = ['name', 'measurement_unit']
+STAGE_TABLE = 'load_ingredients_stage'
+
+User = get_user_model()
+
+
+def iter_csv(file):
+    """Yield (name, unit) rows of a name,unit csv file."""
+    for row in csv.reader(file):
+        if len(row) == 2 and row != HEADER:
+            yield row
+
+
+def iter_json(file):
+    """
+    Yield (name, unit) of objects in a json array or in
+    newline delimited json, reading the file by chunks.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), ''):
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in '[],\r\n\t ':
+                position += 1
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield item['name'], item['measurement_unit']
+    if buffer[position:].strip(' \r\n\t]'):
+        raise CommandError('файл json обрывается посреди объекта')
+
+
+def get_batches(rows, size):
+    """
+    Yield dicts name -> unit of at most size rows, only the last
+    row of the same name is kept, as the name is unique.
+    """
+    rows = iter(rows)
+    while True:
+        batch = {}
+        for name, unit in itertools.islice(rows, size):
+            name, unit = name.strip(), unit.strip()
+            if name and unit:
+                batch[name] = unit
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    """Load ingredient catalog in batches."""
+
+    help = (
+        'Stream ingredients from a name,unit csv file or a json file '
+        'and insert new ones in batches, existing names are skipped '
+        'or updated with --update'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=('csv', 'json'),
+            help='by default taken from the file extension'
+        )
+        parser.add_argument(
+            '--user', help='username of the author, first superuser by default'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--update', action='store_true',
+            help='change measurement unit of existing ingredients'
+        )
+
+    def get_author(self, username):
+        users = User.objects.order_by('pk')
+        if username:
+            author = users.filter(username=username).first()
+        else:
+            author = users.filter(is_superuser=True).first()
+        if author is None:
+            raise CommandError('не найден пользователь - автор ингредиентов')
+        return author
+
+    def load_batch(self, cursor, batch, author, update):
+        """
+        Save one batch, return numbers of created and updated rows.
+        Units are few, so changed rows are updated per unit.
+        """
+        existing = {
+            name: (pk, unit) for pk, name, unit in Ingredient.objects.filter(
+                name__in=batch
+            ).values_list('pk', 'name', 'measurement_unit')
+        }
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(
+                    name=name, measurement_unit=unit,
+                    author=author, last_editor=author
+                )
+                for name, unit in batch.items() if name not in existing
+            ],
+            ignore_conflicts=True
+        )
+        changed = defaultdict(list)
+        if update:
+            for name, (pk, unit) in existing.items():
+                if batch[name] != unit:
+                    changed[batch[name]].append(pk)
+            for unit, pks in changed.items():
+                Ingredient.objects.filter(pk__in=pks).update(
+                    measurement_unit=unit, last_editor=author,
+                    date_modified=timezone.now()
+                )
+        return len(batch) - len(existing), sum(map(len, changed.values()))
+
+    def copy_batch(self, cursor, batch, author, update):
+        """
+        PostgreSQL: COPY the batch into a temporary table, then insert
+        and update from it with one query each.
+        """
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch.items())
+        buffer.seek(0)
+        cursor.execute(f'TRUNCATE {STAGE_TABLE}')
+        cursor.copy_expert(
+            f'COPY {STAGE_TABLE} (name, measurement_unit) '
+            'FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+        table = Ingredient._meta.db_table
+        updated = 0
+        if update:
+            cursor.execute(
+                f'UPDATE {table} AS ingredient '
+                'SET measurement_unit = stage.measurement_unit, '
+                'last_editor_id = %s, date_modified = now() '
+                f'FROM {STAGE_TABLE} AS stage '
+                'WHERE ingredient.name = stage.name '
+                'AND ingredient.measurement_unit <> stage.measurement_unit',
+                [author.pk]
+            )
+            updated = cursor.rowcount
+        cursor.execute(
+            f'INSERT INTO {table} (name, measurement_unit, date_created, '
+            'date_modified, author_id, last_editor_id) '
+            'SELECT name, measurement_unit, now(), now(), %s, %s '
+            f'FROM {STAGE_TABLE} ON CONFLICT DO NOTHING',
+            [author.pk, author.pk]
+        )
+        return cursor.rowcount, updated
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(
+            path
+        )[1].lstrip('.').lower()
+        if file_format not in ('csv', 'json'):
+            raise CommandError('укажите формат файла: csv или json')
+        author = self.get_author(options['user'])
+        read = iter_csv if file_format == 'csv' else iter_json
+        start = time.perf_counter()
+        rows = created = updated = 0
+        postgresql = connection.vendor == 'postgresql'
+        load = self.copy_batch if postgresql else self.load_batch
+        with open(path, encoding='utf-8', newline='') as file:
+            with connection.cursor() as cursor:
+                if postgresql:
+                    cursor.execute(
+                        'CREATE TEMPORARY TABLE IF NOT EXISTS '
+                        f'{STAGE_TABLE} (name text, measurement_unit text)'
+                    )
+                for batch in get_batches(read(file), options['batch_size']):
+                    with transaction.atomic():
+                        batch_created, batch_updated = load(
+                            cursor, batch, author, options['update']
+                        )
+                    rows += len(batch)
+                    created += batch_created
+                    updated += batch_updated
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'{rows} rows')
+        elapsed = time.perf_counter() - start
+        if created or updated:
+            cache.invalidate('ingredients', 'recipes')
+        if not cache.is_shared():
+            self.stderr.write(self.style.WARNING(cache.LOCAL_WARNING))
+        self.stdout.write(
+            f'rows: {rows}, created: {created}, updated: {updated}, '
+            f'skipped: {rows - created - updated}, '
+            f'{rows / elapsed if elapsed else 0:.0f} rows/s'
+        )
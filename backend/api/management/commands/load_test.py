@@ -0,0 +1,131 @@
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from api.benchmarks import summarize
+
+PATHS = (
+    '/api/tags/',
+    '/api/ingredients/',
+    '/api/recipes/',
+    '/api/recipes/?limit=20',
+)
+
+
+class Command(BaseCommand):
+    """Load a running server with concurrent clients."""
+
+    help = (
+        'Send requests from a growing number of concurrent clients '
+        'to a running server and report throughput and latency, '
+        'to compare wsgi and asgi serving with the same workers'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument(
+            '--path', nargs='+', default=list(PATHS),
+            help='paths requested in turn by every client'
+        )
+        parser.add_argument(
+            '--concurrency', nargs='+', type=int, default=[1, 8, 32, 64]
+        )
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='seconds for every concurrency level'
+        )
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help='extra clients reading big responses slowly meanwhile'
+        )
+        parser.add_argument(
+            '--slow-path', default='/api/recipes/?limit=300',
+            help='path requested by slow clients'
+        )
+        parser.add_argument(
+            '--slow-read', type=float, default=0.02,
+            help='seconds a slow client waits after every 4 KB'
+        )
+        parser.add_argument(
+            '--token', help='auth token for endpoints needing a user'
+        )
+
+    def client(self, options, deadline, timings, errors, paths,
+               slow_read=0):
+        """Request paths in turn on one keep-alive connection."""
+        url = urlsplit(options['url'])
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        connection = http.client.HTTPConnection(
+            url.hostname, url.port or 80, timeout=60
+        )
+        number = 0
+        while time.monotonic() < deadline:
+            path = paths[number % len(paths)]
+            number += 1
+            start = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                while response.read(4096):
+                    if slow_read:
+                        time.sleep(slow_read)
+            except (OSError, http.client.HTTPException):
+                errors.append(path)
+                connection.close()
+                continue
+            if response.status != 200:
+                errors.append(path)
+                continue
+            timings.append(time.perf_counter() - start)
+        connection.close()
+
+    def measure(self, concurrency, options):
+        timings, errors = [], []
+        deadline = time.monotonic() + options['duration']
+        threads = [
+            threading.Thread(
+                target=self.client,
+                args=(options, deadline, timings, errors, options['path'])
+            )
+            for _ in range(concurrency)
+        ]
+        # slow clients are not measured, they only hold the server
+        threads += [
+            threading.Thread(
+                target=self.client,
+                args=(
+                    options, deadline, [], [], [options['slow_path']],
+                    options['slow_read']
+                )
+            )
+            for _ in range(options['slow_clients'])
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if not timings:
+            raise CommandError(
+                f'нет успешных ответов от {options["url"]}, '
+                f'ошибок: {len(errors)}'
+            )
+        result = summarize([timing * 1000 for timing in timings])
+        result['throughput'] = len(timings) / elapsed
+        result['errors'] = len(errors)
+        return result
+
+    def handle(self, *args, **options):
+        for concurrency in options['concurrency']:
+            result = self.measure(concurrency, options)
+            self.stdout.write(
+                f'{concurrency:>5} clients: '
+                f'{result["throughput"]:7.1f} req/s '
+                f'p50={result["p50"]:.1f} ms p95={result["p95"]:.1f} ms '
+                f'p99={result["p99"]:.1f} ms errors={result["errors"]}'
+            )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.services import get_counter_mismatches, reconcile_counters
+
+
+class Command(BaseCommand):
+    """Verify or fix denormalized popularity counters."""
+
+    help = (
+        'Compare favourites, shopping list, followers and recipes '
+        'counters with actual rows and fix stale ones'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='only report stale counters, exit with error if any'
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            stale = get_counter_mismatches()
+        else:
+            stale = reconcile_counters()
+        for counter, rows in stale.items():
+            self.stdout.write(f'{counter}: {rows}')
+        if options['verify'] and any(stale.values()):
+            raise CommandError(
+                f'Устаревших счётчиков: {sum(stale.values())}'
+            )
+        self.stdout.write(self.style.SUCCESS('Готово.'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from api import cache
+
+
+class Command(BaseCommand):
+    """Show response cache counters."""
+
+    help = (
+        'Show response cache hit/miss counters, the server has to use '
+        'a shared cache backend for them to count its requests'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--invalidate', action='store_true',
+            help='make all cached responses stale'
+        )
+
+    def handle(self, *args, **options):
+        if not cache.is_shared():
+            self.stderr.write(self.style.WARNING(cache.LOCAL_WARNING))
+        if options['invalidate']:
+            cache.invalidate('tags', 'ingredients', 'recipes')
+        stats = cache.get_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+        self.stdout.write(
+            f'hits={stats["hits"]} misses={stats["misses"]} '
+            f'hit_ratio={ratio:.2%}'
+        )
@@ -0,0 +1,76 @@
+import os
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from foodgram.models import (FavouriteList, Ingredient, IngredientAmount,
+                             Recipe, ShoppingList, Subscription, Tag)
+from api import cache
+from api.benchmarks import seed
+
+CATALOG = os.path.join(
+    os.path.dirname(settings.BASE_DIR), 'data', 'ingredients.csv'
+)
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Fill the database with synthetic data for benchmarks."""
+
+    help = (
+        'Create synthetic users, recipes with ingredients from the '
+        'catalog, tags, favourites, shopping lists and subscriptions'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=10_000)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument(
+            '--authors', type=int, default=20,
+            help='recipes are spread over this many first users'
+        )
+        parser.add_argument(
+            '--ingredients', type=int, default=1000,
+            help='ingredients taken from the catalog'
+        )
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument(
+            '--favourites', type=int, default=20,
+            help='favourite recipes per user'
+        )
+        parser.add_argument(
+            '--carts', type=int, default=5,
+            help='shopping list recipes per user'
+        )
+        parser.add_argument(
+            '--subscriptions', type=int, default=20,
+            help='subscriptions per user'
+        )
+        parser.add_argument(
+            '--catalog', default=CATALOG if os.path.exists(CATALOG) else '',
+            help='name,unit csv file, synthetic names when empty'
+        )
+
+    def handle(self, *args, **options):
+        seed(
+            options['recipes'],
+            ingredients=options['ingredients'],
+            tags=options['tags'],
+            users=options['users'],
+            authors=options['authors'],
+            favourites=options['favourites'],
+            carts=options['carts'],
+            subscriptions=options['subscriptions'],
+            catalog=options['catalog'] or None,
+        )
+        if not cache.is_shared():
+            self.stderr.write(self.style.WARNING(cache.LOCAL_WARNING))
+        for model in (
+            User, Recipe, Ingredient, IngredientAmount, Tag,
+            FavouriteList, ShoppingList, Subscription
+        ):
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: '
+                f'{model.objects.count()}'
+            )
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.services import (calculate_shopping_cart_totals,
+                          get_stored_shopping_cart_totals,
+                          rebuild_shopping_cart_totals)
+
+
+class Command(BaseCommand):
+    """Verify or rebuild precomputed shopping list totals."""
+
+    help = (
+        'Compare stored shopping list totals with the aggregate query '
+        'and rebuild them'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='only report mismatches, exit with error if any'
+        )
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='limit to given user id, can be repeated'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        if not options['verify']:
+            rebuild_shopping_cart_totals(user_ids)
+            self.stdout.write(self.style.SUCCESS('Итоги пересчитаны.'))
+            return
+        expected = calculate_shopping_cart_totals(user_ids)
+        stored = get_stored_shopping_cart_totals(user_ids)
+        mismatches = 0
+        for user_id in sorted(expected.keys() | stored.keys()):
+            if expected.get(user_id, {}) != stored.get(user_id, {}):
+                mismatches += 1
+                self.stdout.write(
+                    f'пользователь {user_id}: ожидается '
+                    f'{expected.get(user_id, {})}, '
+                    f'сохранено {stored.get(user_id, {})}'
+                )
+        if mismatches:
+            raise CommandError(f'Расхождений: {mismatches}')
+        self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
@@ -1,5 +1,18 @@
+import hashlib
+from calendar import timegm
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db.models import Count, Max, Subquery
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date, quote_etag
 from rest_framework import mixins, status, viewsets
 from rest_framework.response import Response
+from core.db import read_from_replica
+
+from .cache import (get_cache, get_user_key, is_recently_changed, make_key,
+                    record)
 
 
 class AutoAddAuthorEditorMixin:
@@ -22,6 +35,58 @@ class ListRetrieveMixin(
     """Mixin for retrieve and list actions."""
 
 
+class SerializationMetricsMixin:
+    """
+    Mixin to count the handler time outside the database, spent
+    on serializing data, as serialization in request metrics.
+    """
+
+    serialization_mark = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        metrics = getattr(request, 'query_metrics', None)
+        if metrics is not None:
+            self.serialization_mark = metrics.mark()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.serialization_mark is not None:
+            request.query_metrics.add_serialization(self.serialization_mark)
+            self.serialization_mark = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReplicaReadMixin:
+    """
+    Mixin to read list and retrieve responses from the replica,
+    the user is still authenticated on the primary database.
+    Responses of a recently changed cache namespace are read from
+    the primary, a lagging replica would refill the cache with
+    data older than the change. So are responses to a user who has
+    just changed favourites, shopping list or subscriptions shown
+    inside them.
+    """
+
+    def get_read_context(self):
+        namespace = getattr(self, 'cache_namespace', None)
+        if namespace is not None and is_recently_changed(namespace):
+            return nullcontext()
+        user = self.request.user
+        if user.is_authenticated and is_recently_changed(
+            get_user_key(user.pk)
+        ):
+            return nullcontext()
+        return read_from_replica()
+
+    def list(self, request, *args, **kwargs):
+        with self.get_read_context():
+            return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        with self.get_read_context():
+            return super().retrieve(request, *args, **kwargs)
+
+
 class DestroyMixin:
     """Mixin with destroy method to delete object from db."""
 
@@ -35,5 +100,168 @@ class DestroyMixin:
                 {'errors': 'этого объекта нет в списке'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        obj.delete()
+        self.perform_destroy(obj)
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ConditionalGetMixin:
+    """
+    Mixin to answer conditional list and retrieve requests
+    with validators computed before any serialization.
+    """
+
+    # models shown inside responses, their latest change is validated too
+    validated_related_models = ()
+
+    def should_validate(self, request):
+        return request.method == 'GET'
+
+    def get_validated_base_queryset(self):
+        return self.get_queryset()
+
+    def get_validated_queryset(self):
+        """Return objects the response is built from."""
+        queryset = self.filter_queryset(self.get_validated_base_queryset())
+        if self.action != 'retrieve':
+            return queryset
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return queryset.filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+
+    def get_validators_state(self, request):
+        """
+        Return values the response depends on and the latest
+        modification time among them, found with one query.
+        """
+        aggregates = {
+            'last_modified': Max('date_modified'), 'count': Count('pk')
+        }
+        for model in self.validated_related_models:
+            aggregates[model._meta.model_name] = Max(Subquery(
+                model.objects.order_by('-date_modified').values(
+                    'date_modified'
+                )[:1]
+            ))
+        state = self.get_validated_queryset().order_by().aggregate(
+            **aggregates
+        )
+        if self.action == 'list':
+            # the paginator takes it instead of counting again
+            self.validated_count = state['count']
+        timestamps = [
+            value for name, value in state.items() if name != 'count'
+        ]
+        return (
+            list(state.values()), max(filter(None, timestamps), default=None)
+        )
+
+    def should_send_last_modified(self, request):
+        """
+        Deleted rows of a list and of related or per-user data leave
+        the latest date_modified as it was, such responses are
+        validated by ETag alone.
+        """
+        return self.action == 'retrieve' and not self.validated_related_models
+
+    def get_validators(self, request):
+        """Return ETag and Last-Modified timestamp of the response."""
+        state, last_modified = self.get_validators_state(request)
+        if not self.should_send_last_modified(request):
+            last_modified = None
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in sorted(values)
+        )
+        raw = repr([request.path, params, state])
+        etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+        if last_modified is not None:
+            last_modified = timegm(last_modified.utctimetuple())
+        return etag, last_modified
+
+    def set_validators(self, response, etag, last_modified):
+        if etag is None:
+            return response
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def get_conditional_response(self, request, handler, *args, **kwargs):
+        if not self.should_validate(request):
+            return handler(request, *args, **kwargs)
+        etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (
+            status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED
+        ):
+            self.set_validators(response, etag, last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            request, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+
+class CachedResponseMixin(ConditionalGetMixin):
+    """
+    Mixin to cache rendered list and retrieve responses
+    and answer conditional requests from the cache.
+    """
+
+    cache_namespace = None
+    cache_anonymous_only = False
+
+    def should_cache_response(self, request):
+        return request.method == 'GET' and not (
+            self.cache_anonymous_only and request.user.is_authenticated
+        )
+
+    def get_conditional_response(self, request, handler, *args, **kwargs):
+        if not self.should_cache_response(request):
+            return super().get_conditional_response(
+                request, handler, *args, **kwargs
+            )
+        cache = get_cache()
+        key = make_key(self.cache_namespace, request)
+        entry = cache.get(key)
+        record(hit=entry is not None)
+        if entry is None:
+            response = super().get_conditional_response(
+                request, handler, *args, **kwargs
+            )
+            response['X-Cache'] = 'MISS'
+            if response.status_code == status.HTTP_200_OK:
+                response = self.finalize_response(request, response)
+                response.render()
+                cache.set(key, {
+                    'content': response.content,
+                    'content_type': response['Content-Type'],
+                    'etag': response.get('ETag'),
+                    'last_modified': response.get('Last-Modified'),
+                }, settings.RESPONSE_CACHE_TIMEOUT)
+        else:
+            last_modified = entry['last_modified'] and parse_http_date(
+                entry['last_modified']
+            )
+            response = get_conditional_response(
+                request, etag=entry['etag'], last_modified=last_modified
+            ) or HttpResponse(
+                entry['content'], content_type=entry['content_type']
+            )
+            self.set_validators(response, entry['etag'], last_modified)
+            response['X-Cache'] = 'HIT'
+        if self.cache_anonymous_only:
+            patch_vary_headers(response, ('Authorization',))
+        return response
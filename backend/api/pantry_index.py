@@ -0,0 +1,232 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from foodgram.models import IngredientAmount
+
+# an ingredient used by more than 1/32 of recipes is kept as a bitset,
+# which is then smaller than an array of 4 byte recipe positions
+DENSE_RATIO = 32
+
+
+def positions_to_mask(positions, size):
+    """Return bitset with given bit positions set."""
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def count_bits(masks):
+    """
+    Add bitsets up per bit position, returning bit planes
+    of the binary counters: plane i holds bit i of every count.
+    """
+    planes = []
+    for carry in masks:
+        for number, plane in enumerate(planes):
+            planes[number] = plane ^ carry
+            carry &= plane
+            if not carry:
+                break
+        else:
+            if carry:
+                planes.append(carry)
+    return planes
+
+
+class PantryData:
+    """
+    Recipes numbered by position in id order, ingredient postings
+    of those positions and bitsets of recipes by ingredient count.
+    """
+
+    def __init__(self, recipe_ids, sizes, postings):
+        self.recipe_ids = recipe_ids
+        self.positions = {
+            recipe_id: position
+            for position, recipe_id in enumerate(recipe_ids)
+        }
+        self.sizes = sizes
+        self.postings = postings
+        by_size = {}
+        for position, size in enumerate(sizes):
+            by_size.setdefault(size, []).append(position)
+        self.size_masks = {
+            size: positions_to_mask(positions, len(recipe_ids))
+            for size, positions in by_size.items()
+        }
+
+    def get_mask(self, ingredient_id):
+        posting = self.postings.get(ingredient_id, 0)
+        if isinstance(posting, int):
+            return posting
+        return positions_to_mask(posting, len(self.recipe_ids))
+
+    def add(self, ingredient_id, position):
+        posting = self.postings.setdefault(ingredient_id, array('L'))
+        if isinstance(posting, int):
+            self.postings[ingredient_id] = posting | 1 << position
+            return
+        insort(posting, position)
+        if len(posting) * DENSE_RATIO > len(self.recipe_ids):
+            self.postings[ingredient_id] = positions_to_mask(
+                posting, len(self.recipe_ids)
+            )
+
+    def discard(self, ingredient_id, position):
+        posting = self.postings[ingredient_id]
+        if isinstance(posting, int):
+            self.postings[ingredient_id] = posting & ~(1 << position)
+            return
+        index = bisect_left(posting, position)
+        if index < len(posting) and posting[index] == position:
+            posting.pop(index)
+
+    def set_size(self, position, size):
+        old_size = self.sizes[position]
+        if old_size:
+            self.size_masks[old_size] &= ~(1 << position)
+        if size:
+            self.size_masks[size] = (
+                self.size_masks.get(size, 0) | 1 << position
+            )
+        self.sizes[position] = size
+
+
+class PantryIndex:
+    """
+    In-memory inverted index from ingredient to recipes
+    to rank recipes by the share of their ingredients on hand.
+    Common ingredients are kept as bitsets over recipe positions,
+    rare ones as sorted arrays of positions.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._built_at = 0.0
+
+    def invalidate(self):
+        """Drop the index, it is rebuilt on the next match."""
+        self._data = None
+
+    def build(self):
+        """Load all recipe ingredients into postings."""
+        rows = IngredientAmount.objects.order_by(
+            'recipe_id', 'ingredient_id'
+        ).values_list('recipe_id', 'ingredient_id')
+        recipe_ids, sizes, postings = array('L'), array('H'), {}
+        for recipe_id, ingredient_id in rows.iterator(chunk_size=10000):
+            if not recipe_ids or recipe_ids[-1] != recipe_id:
+                recipe_ids.append(recipe_id)
+                sizes.append(0)
+            sizes[-1] += 1
+            postings.setdefault(ingredient_id, array('L')).append(
+                len(recipe_ids) - 1
+            )
+        for ingredient_id, posting in postings.items():
+            if len(posting) * DENSE_RATIO > len(recipe_ids):
+                postings[ingredient_id] = positions_to_mask(
+                    posting, len(recipe_ids)
+                )
+        self._data = PantryData(recipe_ids, sizes, postings)
+        self._built_at = time.monotonic()
+        return self._data
+
+    def _get_data(self):
+        """
+        Return current index, rebuilding it once it is too old.
+        Other threads keep using the old index during a rebuild.
+        """
+        data = self._data
+        ttl = settings.PANTRY_INDEX_TTL
+        if data is not None and time.monotonic() - self._built_at < ttl:
+            return data
+        if not self._lock.acquire(blocking=data is None):
+            return data
+        try:
+            if self._data is not None and self._data is not data:
+                return self._data
+            return self.build()
+        finally:
+            self._lock.release()
+
+    def update_recipe(self, recipe_id, ingredient_ids=None):
+        """
+        Replace indexed ingredients of recipe with the stored ones,
+        an empty list removes the recipe.
+        """
+        data = self._data
+        if data is None:
+            return
+        if ingredient_ids is None:
+            ingredient_ids = list(
+                IngredientAmount.objects.filter(
+                    recipe_id=recipe_id
+                ).values_list('ingredient_id', flat=True)
+            )
+        with self._lock:
+            position = data.positions.get(recipe_id)
+            if position is None:
+                if not ingredient_ids:
+                    return
+                position = data.positions[recipe_id] = len(data.recipe_ids)
+                data.recipe_ids.append(recipe_id)
+                data.sizes.append(0)
+            else:
+                for ingredient_id in list(data.postings):
+                    data.discard(ingredient_id, position)
+            for ingredient_id in ingredient_ids:
+                data.add(ingredient_id, position)
+            data.set_size(position, len(ingredient_ids))
+
+    def remove_recipe(self, recipe_id):
+        """Forget recipe in the index."""
+        self.update_recipe(recipe_id, [])
+
+    def match(self, ingredient_ids, limit=None):
+        """
+        Return up to limit (recipe id, matched, total) tuples
+        of recipes using given ingredients, ranked by coverage,
+        then by matched ingredients and newest first.
+        """
+        if limit is None:
+            limit = settings.PANTRY_MATCH_LIMIT
+        data = self._get_data()
+        planes = count_bits(
+            data.get_mask(ingredient_id)
+            for ingredient_id in set(ingredient_ids)
+        )
+        size_masks = dict(data.size_masks)
+        max_matched = 2 ** len(planes) - 1
+        ranks = sorted(
+            (
+                (matched / total, matched, total)
+                for total in size_masks
+                for matched in range(1, min(total, max_matched) + 1)
+            ),
+            reverse=True
+        )
+        equal_masks = {}
+        result = []
+        for _, matched, total in ranks:
+            if matched not in equal_masks:
+                # recipes with exactly matched ingredients on hand
+                mask = -1
+                for number, plane in enumerate(planes):
+                    mask &= plane if matched >> number & 1 else ~plane
+                equal_masks[matched] = mask
+            hits = equal_masks[matched] & size_masks[total]
+            while hits and len(result) < limit:
+                position = hits.bit_length() - 1
+                hits ^= 1 << position
+                result.append((data.recipe_ids[position], matched, total))
+            if len(result) == limit:
+                break
+        return result
+
+
+pantry_index = PantryIndex()
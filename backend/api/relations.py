@@ -0,0 +1,57 @@
+from django.db.models import CharField, Value
+from foodgram.models import FavouriteList, ShoppingList, Subscription
+
+CONTEXT_KEY = 'user_relations'
+
+
+class UserRelations:
+    """
+    Ids of favourite and shopping list recipes and of followed authors
+    of the request user, loaded only for the serialized objects.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.favourites = set()
+        self.shopping_cart = set()
+        self.following = set()
+        self.loaded_recipes = set()
+        self.loaded_authors = set()
+
+    def get_queries(self, recipe_ids, author_ids):
+        """Yield (kind, object id) queries for given objects."""
+        if recipe_ids:
+            for kind, model in (
+                ('favourites', FavouriteList),
+                ('shopping_cart', ShoppingList),
+            ):
+                yield model.objects.filter(
+                    user=self.user, recipe_id__in=recipe_ids
+                ).annotate(
+                    kind=Value(kind, output_field=CharField())
+                ).order_by().values_list('kind', 'recipe_id')
+        if author_ids:
+            yield Subscription.objects.filter(
+                user=self.user, author_id__in=author_ids
+            ).annotate(
+                kind=Value('following', output_field=CharField())
+            ).order_by().values_list('kind', 'author_id')
+
+    def load(self, recipe_ids=(), author_ids=()):
+        """Fetch relations to objects not loaded yet with one query."""
+        recipe_ids = set(recipe_ids) - self.loaded_recipes
+        author_ids = set(author_ids) - self.loaded_authors
+        if self.user.is_anonymous or not (recipe_ids or author_ids):
+            return
+        self.loaded_recipes |= recipe_ids
+        self.loaded_authors |= author_ids
+        first, *rest = self.get_queries(recipe_ids, author_ids)
+        for kind, object_id in first.union(*rest, all=True):
+            getattr(self, kind).add(object_id)
+
+
+def get_user_relations(context):
+    """Return relations of the request user shared by the serializers."""
+    if CONTEXT_KEY not in context:
+        context[CONTEXT_KEY] = UserRelations(context['request'].user)
+    return context[CONTEXT_KEY]
@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, TrigramSimilarity)
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery
+from foodgram.models import IngredientAmount, Recipe
+
+
+def is_full_text_supported():
+    """Search vectors and trigrams live only in PostgreSQL."""
+    return connection.vendor == 'postgresql'
+
+
+def get_search_vector():
+    """
+    Return expression weighting recipe name over ingredient names
+    over description.
+    """
+    ingredient_names = IngredientAmount.objects.filter(
+        recipe=OuterRef('pk')
+    ).order_by().values('recipe').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names')
+    config = settings.RECIPE_SEARCH_CONFIG
+    return (
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(Subquery(ingredient_names), weight='B', config=config)
+        + SearchVector('text', weight='C', config=config)
+    )
+
+
+def update_search_vectors(queryset):
+    """Recompute stored search vectors of queryset recipes."""
+    if not is_full_text_supported():
+        return 0
+    return queryset.update(search_vector=get_search_vector())
+
+
+def schedule_search_vector_update(queryset):
+    """Update search vectors once ingredients are saved too."""
+    transaction.on_commit(lambda: update_search_vectors(queryset))
+
+
+def search_recipes(queryset, query):
+    """
+    Filter recipes matching the query by stored search vector
+    or by name similarity for typos, best matches first.
+    Other databases get a slow substring match.
+    """
+    if not is_full_text_supported():
+        return queryset.annotate(
+            in_ingredients=Exists(IngredientAmount.objects.filter(
+                recipe=OuterRef('pk'), ingredient__name__icontains=query
+            ))
+        ).filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+            | Q(in_ingredients=True)
+        )
+    search_query = SearchQuery(
+        query, config=settings.RECIPE_SEARCH_CONFIG, search_type='websearch'
+    )
+    return queryset.filter(
+        Q(search_vector=search_query) | Q(name__trigram_similar=query)
+    ).annotate(
+        rank=(
+            SearchRank(F('search_vector'), search_query)
+            + TrigramSimilarity('name', query)
+        )
+    ).order_by('-rank', '-id')
+
+
+def refresh_search_vectors(queryset=None, batch_size=10000):
+    """Recompute search vectors of recipes in batches of ids."""
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    updated = 0
+    last_id = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last_id).order_by(
+                'pk'
+            ).values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return updated
+        updated += update_search_vectors(Recipe.objects.filter(pk__in=ids))
+        last_id = ids[-1]
@@ -1,10 +1,27 @@
+from django.db import models, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 from foodgram.models import (FavouriteList, Ingredient, IngredientAmount,
                              Recipe, ShoppingList, Subscription, Tag)
 from users.models import User
 
-from .fields import Base64ImageField
+from .fields import Base64ImageField, BulkPrimaryKeyRelatedField
+from .relations import get_user_relations
+from .services import (get_amounts_delta, get_cart_holders, lock_recipe,
+                       update_shopping_cart_totals)
+from .utils import get_recipes_limit
+
+
+class RelationsListSerializer(serializers.ListSerializer):
+    """Load user relations of all listed objects at once."""
+
+    def to_representation(self, data):
+        objects = list(
+            data.all() if isinstance(data, models.Manager) else data
+        )
+        self.child.load_relations(get_user_relations(self.context), objects)
+        return super().to_representation(objects)
 
 
 class CustomUserSerializer(serializers.ModelSerializer):
@@ -18,14 +35,15 @@ class CustomUserSerializer(serializers.ModelSerializer):
             'email', 'id', 'username', 'first_name',
             'last_name', 'is_subscribed'
         )
+        list_serializer_class = RelationsListSerializer
+
+    def load_relations(self, relations, users):
+        relations.load(author_ids=[user.pk for user in users])
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return Subscription.objects.filter(
-            author=obj, user=user
-        ).exists()
+        relations = get_user_relations(self.context)
+        self.load_relations(relations, [obj])
+        return obj.pk in relations.following
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -62,7 +80,7 @@ class IngredientAmountShowSerializer(serializers.ModelSerializer):
 class RecipeReadOnlySerializer(serializers.ModelSerializer):
     """Read only recipe serializer."""
 
-    image = Base64ImageField()
+    image = Base64ImageField(variant='thumbnail')
 
     class Meta:
         model = Recipe
@@ -70,13 +88,28 @@ class RecipeReadOnlySerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'name', 'image', 'cooking_time')
 
 
+class PantryRecipeSerializer(RecipeReadOnlySerializer):
+    """Serializer for recipes matched by ingredients on hand."""
+
+    matched_count = serializers.IntegerField(read_only=True)
+    ingredients_count = serializers.IntegerField(read_only=True)
+    coverage = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeReadOnlySerializer.Meta):
+        fields = RecipeReadOnlySerializer.Meta.fields + (
+            'matched_count', 'ingredients_count', 'coverage'
+        )
+
+
 class RecipeViewSerializer(serializers.ModelSerializer):
     """Serializer for displaying recipes."""
 
     image = Base64ImageField()
     tags = TagSerializer(many=True, read_only=True)
     author = CustomUserSerializer(read_only=True)
-    ingredients = serializers.SerializerMethodField()
+    ingredients = IngredientAmountShowSerializer(
+        source='ingredient_amounts', many=True, read_only=True
+    )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -88,32 +121,30 @@ class RecipeViewSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart', 'name',
             'image', 'text', 'cooking_time'
         )
+        list_serializer_class = RelationsListSerializer
 
-    def get_ingredients(self, obj):
-        qs = IngredientAmount.objects.filter(recipe=obj)
-        return IngredientAmountShowSerializer(qs, many=True).data
+    def load_relations(self, relations, recipes):
+        """Nested authors are loaded along with recipes."""
+        relations.load(
+            recipe_ids=[recipe.pk for recipe in recipes],
+            author_ids=[recipe.author_id for recipe in recipes]
+        )
 
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return FavouriteList.objects.filter(
-            user=user, recipe_id=obj.id
-        ).exists()
+        relations = get_user_relations(self.context)
+        self.load_relations(relations, [obj])
+        return obj.pk in relations.favourites
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return ShoppingList.objects.filter(
-            user=user, recipe_id=obj.id
-        ).exists()
+        relations = get_user_relations(self.context)
+        self.load_relations(relations, [obj])
+        return obj.pk in relations.shopping_cart
 
 
 class IngredientAddToRecipeSerializer(serializers.ModelSerializer):
     """Serializer to add ingredients to a recipe."""
 
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -124,7 +155,7 @@ class IngredientAddToRecipeSerializer(serializers.ModelSerializer):
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer to create or update recipes."""
 
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(), many=True
     )
     author = CustomUserSerializer(read_only=True)
@@ -153,6 +184,15 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError(
                     'Количество должно быть больше нуля.'
                 )
+        ids = [ingredient['id'] for ingredient in data]
+        existing = set(
+            Ingredient.objects.filter(id__in=ids).values_list('id', flat=True)
+        )
+        missing = [str(id) for id in ids if id not in existing]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиентов с id {", ".join(missing)} не существует.'
+            )
         return data
 
     def validate_tags(self, data):
@@ -176,38 +216,87 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         return data
 
     def add_ingredients(self, ingredients, recipe):
-        for ing in ingredients:
-            ing_id = ing.get('id')
-            IngredientAmount.objects.create(
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(
                 recipe=recipe,
-                ingredient=ing_id,
-                amount=ing.get('amount')
-            )
+                ingredient_id=ing['id'],
+                amount=ing['amount']
+            ) for ing in ingredients
+        )
+
+    def update_ingredients(self, ingredients, recipe):
+        """Write only added, removed or changed ingredient amounts."""
+        current = {
+            item.ingredient_id: item
+            for item in IngredientAmount.objects.filter(recipe=recipe)
+        }
+        old_amounts = {key: item.amount for key, item in current.items()}
+        new_amounts = {ing['id']: ing['amount'] for ing in ingredients}
+        IngredientAmount.objects.filter(
+            recipe=recipe,
+            ingredient_id__in=old_amounts.keys() - new_amounts.keys()
+        ).delete()
+        self.add_ingredients(
+            [ing for ing in ingredients if ing['id'] not in current],
+            recipe
+        )
+        changed = []
+        for ingredient_id, item in current.items():
+            amount = new_amounts.get(ingredient_id, item.amount)
+            if amount != item.amount:
+                item.amount = amount
+                changed.append(item)
+        IngredientAmount.objects.bulk_update(changed, ['amount'])
+        # bulk writes send no signals, deleted amounts leave the carts
+        # through post_delete
+        kept = {
+            key: amount for key, amount in old_amounts.items()
+            if key in new_amounts
+        }
+        update_shopping_cart_totals(
+            get_cart_holders(recipe.pk), get_amounts_delta(kept, new_amounts)
+        )
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         image = validated_data.pop('image')
         new_recipe = Recipe.objects.create(image=image, **validated_data)
+        image.close()
         self.add_ingredients(ingredients, new_recipe)
         new_recipe.tags.set(tags)
         return new_recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
+        lock_recipe(instance.pk)
         instance.last_editor = validated_data.pop(
             'last_editor', self.context['request'].user
         )
-        tags_data = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients')
+        tags_data = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        image = validated_data.get('image')
         super().update(instance, validated_data)
+        if image:
+            image.close()
         if tags_data:
             instance.tags.set(tags_data)
         if ingredients:
-            instance.ingredients.clear()
-            self.add_ingredients(ingredients, instance)
+            self.update_ingredients(ingredients, instance)
         return instance
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch(
+                'ingredient_amounts',
+                queryset=IngredientAmount.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
         return RecipeViewSerializer(
             instance, context={
                 'request': self.context.get('request')
@@ -267,28 +356,23 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         )
 
     def get_recipes_count(self, obj):
-        return obj.author.foodgram_recipe_authors.count()
+        return obj.author.recipes_count
 
     def get_recipes(self, obj):
-        recipes_limit = self.context.get(
-            'request'
-        ).query_params.get('recipes_limit')
-        try:
-            recipes_limit = int(recipes_limit)
-        except (TypeError, ValueError):
-            recipes_limit = None
-        qs = obj.author.foodgram_recipe_authors.all()
-        if recipes_limit:
-            qs = qs[:recipes_limit]
+        if hasattr(obj.author, 'feed_recipes'):
+            qs = obj.author.feed_recipes
+        else:
+            qs = obj.author.foodgram_recipe_authors.all()
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            if recipes_limit:
+                qs = qs[:recipes_limit]
         return RecipeReadOnlySerializer(
             qs, many=True, context=self.context
         ).data
 
     def get_is_subscribed(self, obj):
-        return Subscription.objects.filter(
-            user=obj.user,
-            author=obj.author
-        ).exists()
+        """Subscription object itself means the user is subscribed."""
+        return True
 
     def get_user_and_author(self):
         kwargs = self.context.get('request').parser_context.get('kwargs')
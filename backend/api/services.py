@@ -0,0 +1,242 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from foodgram.models import (FavouriteList, IngredientAmount, Recipe,
+                             ShoppingCartIngredient, ShoppingList,
+                             Subscription)
+
+User = get_user_model()
+
+# denormalized counter: (model, counter field, counted model, its fk field)
+COUNTERS = (
+    (Recipe, 'favourites_count', FavouriteList, 'recipe'),
+    (Recipe, 'shopping_cart_count', ShoppingList, 'recipe'),
+    (User, 'followers_count', Subscription, 'author'),
+    (User, 'recipes_count', Recipe, 'author'),
+)
+
+
+def lock_recipe(recipe_id):
+    """
+    Lock recipe row till the end of the transaction, so that its
+    amounts and the shopping lists holding it change one at a time
+    and the stored totals do not drift.
+    """
+    list(Recipe.objects.select_for_update().filter(
+        pk=recipe_id
+    ).values_list('pk', flat=True))
+
+
+def get_recipe_amounts(recipe_id) -> dict:
+    """Return {ingredient_id: amount} for given recipe."""
+    return dict(
+        IngredientAmount.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', 'amount')
+    )
+
+
+def get_amounts_delta(old: dict, new: dict) -> dict:
+    """Return per ingredient change between two recipe amount maps."""
+    delta = {}
+    for ingredient_id in old.keys() | new.keys():
+        change = new.get(ingredient_id, 0) - old.get(ingredient_id, 0)
+        if change:
+            delta[ingredient_id] = change
+    return delta
+
+
+def get_cart_holders(recipe_id):
+    """Return ids of users having recipe in their shopping lists."""
+    return ShoppingList.objects.filter(recipe_id=recipe_id).values_list(
+        'user_id', flat=True
+    )
+
+
+@transaction.atomic
+def change_cart_recipe(user_id, recipe_id, sign):
+    """Add (sign 1) or remove (sign -1) recipe amounts to user's totals."""
+    lock_recipe(recipe_id)
+    update_shopping_cart_totals([user_id], {
+        ingredient_id: sign * amount
+        for ingredient_id, amount in get_recipe_amounts(recipe_id).items()
+    })
+
+
+@transaction.atomic
+def change_cart_amount(recipe_id, ingredient_id, change):
+    """Apply recipe amount change to totals of users holding the recipe."""
+    lock_recipe(recipe_id)
+    update_shopping_cart_totals(
+        get_cart_holders(recipe_id), {ingredient_id: change}
+    )
+
+
+def update_shopping_cart_totals(user_ids, delta: dict):
+    """
+    Apply ingredient amount changes to shopping list totals
+    of given users, dropping totals that reach zero.
+    """
+    user_ids = list(user_ids)
+    if not user_ids or not delta:
+        return
+    with transaction.atomic():
+        existing = {
+            (total.user_id, total.ingredient_id): total
+            for total in ShoppingCartIngredient.objects.select_for_update(
+            ).filter(user_id__in=user_ids, ingredient_id__in=delta)
+        }
+        to_create, to_update, to_delete = [], [], []
+        for user_id in user_ids:
+            for ingredient_id, change in delta.items():
+                total = existing.get((user_id, ingredient_id))
+                if total is None:
+                    if change > 0:
+                        to_create.append(ShoppingCartIngredient(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            total_amount=change
+                        ))
+                    continue
+                total.total_amount += change
+                if total.total_amount > 0:
+                    to_update.append(total)
+                else:
+                    to_delete.append(total.pk)
+        ShoppingCartIngredient.objects.bulk_create(to_create)
+        ShoppingCartIngredient.objects.bulk_update(
+            to_update, ['total_amount']
+        )
+        ShoppingCartIngredient.objects.filter(pk__in=to_delete).delete()
+
+
+def calculate_shopping_cart_totals(user_ids=None) -> dict:
+    """
+    Compute shopping list totals from scratch with the aggregate query:
+    {user_id: {ingredient_id: total_amount}}.
+    """
+    # one filter() call, so that the shopping lists are joined once
+    if user_ids is None:
+        queryset = IngredientAmount.objects.filter(
+            recipe__foodgram_shoppinglist_recipes__isnull=False
+        )
+    else:
+        queryset = IngredientAmount.objects.filter(
+            recipe__foodgram_shoppinglist_recipes__user__in=user_ids
+        )
+    totals = defaultdict(dict)
+    rows = queryset.values_list(
+        'recipe__foodgram_shoppinglist_recipes__user', 'ingredient'
+    ).annotate(total=Sum('amount')).order_by()
+    for user_id, ingredient_id, total in rows.iterator():
+        totals[user_id][ingredient_id] = total
+    return totals
+
+
+def get_stored_shopping_cart_totals(user_ids=None) -> dict:
+    """Return stored totals as {user_id: {ingredient_id: total_amount}}."""
+    queryset = ShoppingCartIngredient.objects.all()
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    totals = defaultdict(dict)
+    rows = queryset.values_list('user_id', 'ingredient_id', 'total_amount')
+    for user_id, ingredient_id, total in rows.iterator():
+        totals[user_id][ingredient_id] = total
+    return totals
+
+
+@transaction.atomic
+def rebuild_shopping_cart_totals(user_ids=None):
+    """Replace stored shopping list totals with freshly computed ones."""
+    totals = calculate_shopping_cart_totals(user_ids)
+    queryset = ShoppingCartIngredient.objects.all()
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    queryset.delete()
+    ShoppingCartIngredient.objects.bulk_create(
+        (
+            ShoppingCartIngredient(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                total_amount=total
+            )
+            for user_id, amounts in totals.items()
+            for ingredient_id, total in amounts.items()
+        ),
+        batch_size=1000
+    )
+
+
+def get_user_relations_state(user) -> list:
+    """
+    Return count and latest addition time of user's favourites,
+    shopping list and subscriptions with one query.
+    """
+    annotations = {}
+    for name, model in (
+        ('favourites', FavouriteList),
+        ('shopping_list', ShoppingList),
+        ('subscriptions', Subscription),
+    ):
+        related = model.objects.filter(
+            user=OuterRef('pk')
+        ).order_by().values('user')
+        annotations[f'{name}_count'] = Subquery(
+            related.annotate(value=Count('pk')).values('value')
+        )
+        annotations[f'{name}_last'] = Subquery(
+            related.annotate(value=Max('date_created')).values('value')
+        )
+    return list(
+        User.objects.filter(pk=user.pk).annotate(
+            **annotations
+        ).values_list(*annotations).first()
+    )
+
+
+def change_counters(queryset, **deltas):
+    """
+    Shift counter columns of queryset rows by given deltas
+    with a single UPDATE, never going below zero.
+    """
+    queryset.update(**{
+        field: Greatest(F(field) + delta, Value(0))
+        for field, delta in deltas.items()
+    })
+
+
+def count_related(model, field):
+    """Return subquery counting model rows pointing to the outer row."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(value=Count('pk')).values('value')
+    ), 0)
+
+
+def get_counter_mismatches() -> dict:
+    """Return number of rows with a stale value of every counter."""
+    return {
+        f'{model._meta.model_name}.{counter}': model.objects.annotate(
+            expected=count_related(related_model, field)
+        ).exclude(**{counter: F('expected')}).count()
+        for model, counter, related_model, field in COUNTERS
+    }
+
+
+@transaction.atomic
+def reconcile_counters() -> dict:
+    """Recount stale counters and return number of fixed rows."""
+    fixed = {}
+    for model, counter, related_model, field in COUNTERS:
+        expected = count_related(related_model, field)
+        stale = model.objects.annotate(expected=expected).exclude(
+            **{counter: F('expected')}
+        ).values('pk')
+        fixed[f'{model._meta.model_name}.{counter}'] = model.objects.filter(
+            pk__in=stale
+        ).update(**{counter: expected})
+    return fixed
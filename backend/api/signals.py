@@ -0,0 +1,222 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+from foodgram.models import (FavouriteList, Ingredient, IngredientAmount,
+                             Recipe, ShoppingList, Subscription, Tag)
+
+from . import cache
+from .images import schedule_variants
+from .ingredient_index import ingredient_index
+from .pantry_index import pantry_index
+from .search import schedule_search_vector_update
+from .services import (COUNTERS, change_cart_amount, change_cart_recipe,
+                       change_counters)
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    """Rebuild ingredient autocomplete index after catalog changes."""
+    ingredient_index.invalidate()
+    cache.invalidate('ingredients', 'recipes')
+
+
+@receiver(post_delete, sender=Ingredient)
+def invalidate_pantry_index(sender, **kwargs):
+    """Deleted ingredient vanishes from many recipes at once."""
+    pantry_index.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_tag_responses(sender, **kwargs):
+    """Drop cached responses showing tags."""
+    cache.invalidate('tags', 'recipes')
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=IngredientAmount)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_responses(sender, **kwargs):
+    """Drop cached recipe responses."""
+    cache.invalidate('recipes')
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_responses(sender, update_fields=None, **kwargs):
+    """Drop cached recipe responses showing author data."""
+    if update_fields and set(update_fields) <= {'last_login', 'password'}:
+        return
+    cache.invalidate('recipes')
+
+
+@receiver(post_save, sender=Recipe)
+def create_image_variants(sender, instance, **kwargs):
+    """Generate resized variants of a new or replaced recipe image."""
+    if (instance.image
+            and instance.image_variants.get('source') != instance.image.name):
+        schedule_variants(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    """Count recipes created through the api and the admin."""
+    if created:
+        change_counters(
+            User.objects.filter(pk=instance.author_id), recipes_count=1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    change_counters(
+        User.objects.filter(pk=instance.author_id), recipes_count=-1
+    )
+
+
+# list model: (model counting the rows, its counter, list foreign key)
+LIST_COUNTERS = {
+    related_model: (model, counter, field)
+    for model, counter, related_model, field in COUNTERS
+    if related_model is not Recipe
+}
+
+
+def shift_list_counter(sender, row, delta):
+    model, counter, field = LIST_COUNTERS[sender]
+    change_counters(
+        model.objects.filter(pk=getattr(row, f'{field}_id')),
+        **{counter: delta}
+    )
+
+
+@receiver(post_save, sender=FavouriteList)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_save, sender=Subscription)
+def increment_list_counter(sender, instance, created, **kwargs):
+    """
+    Count favourites, shopping lists and followers added anywhere:
+    the api, the admin and the orm. Bulk writes go uncounted,
+    reconcile_counters repairs them.
+    """
+    if created:
+        shift_list_counter(sender, instance, 1)
+        return
+    field = f'{LIST_COUNTERS[sender][2]}_id'
+    stored = getattr(instance, 'stored_row', None)
+    if stored is not None and getattr(stored, field) != getattr(
+        instance, field
+    ):
+        shift_list_counter(sender, stored, -1)
+        shift_list_counter(sender, instance, 1)
+
+
+@receiver(post_delete, sender=FavouriteList)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_delete, sender=Subscription)
+def decrement_list_counter(sender, instance, **kwargs):
+    """Deleted rows are uncounted, cascade deletes of users included."""
+    shift_list_counter(sender, instance, -1)
+
+
+@receiver([post_save, post_delete], sender=FavouriteList)
+@receiver([post_save, post_delete], sender=ShoppingList)
+@receiver([post_save, post_delete], sender=Subscription)
+def mark_user_relations_changed(sender, instance, **kwargs):
+    """Read the user's next responses from the primary database."""
+    cache.mark_changed(cache.get_user_key(instance.user_id))
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, **kwargs):
+    """Index saved recipe after its ingredients are saved too."""
+    schedule_search_vector_update(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_recipes_search_vectors(sender, instance, created,
+                                             **kwargs):
+    """Reindex recipes showing the renamed ingredient."""
+    if not created:
+        schedule_search_vector_update(
+            Recipe.objects.filter(ingredient_amounts__ingredient=instance)
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def update_pantry_index(sender, instance, **kwargs):
+    """Reindex recipe ingredients once they are saved too."""
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: pantry_index.update_recipe(recipe_id))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_pantry_index(sender, instance, **kwargs):
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: pantry_index.remove_recipe(recipe_id))
+
+
+@receiver(pre_save, sender=FavouriteList)
+@receiver(pre_save, sender=ShoppingList)
+@receiver(pre_save, sender=Subscription)
+@receiver(pre_save, sender=IngredientAmount)
+def remember_stored_row(sender, instance, **kwargs):
+    """
+    Keep the row a save replaces, its amounts leave the cart totals
+    and the object it pointed to is uncounted.
+    """
+    instance.stored_row = None if instance._state.adding else (
+        sender.objects.filter(pk=instance.pk).first()
+    )
+
+
+@receiver(post_save, sender=ShoppingList)
+def add_recipe_to_cart_totals(sender, instance, **kwargs):
+    """
+    Keep shopping list totals of lists changed anywhere: the api,
+    the admin and the orm. Bulk writes have to update them themselves.
+    """
+    stored = getattr(instance, 'stored_row', None)
+    if stored is not None and (stored.user_id, stored.recipe_id) == (
+        instance.user_id, instance.recipe_id
+    ):
+        return
+    with transaction.atomic():
+        if stored is not None:
+            change_cart_recipe(stored.user_id, stored.recipe_id, -1)
+        change_cart_recipe(instance.user_id, instance.recipe_id, 1)
+
+
+@receiver(post_delete, sender=ShoppingList)
+def remove_recipe_from_cart_totals(sender, instance, **kwargs):
+    """
+    Deleted recipe leaves the cart once: with a cascade delete of it
+    either its amounts or the lists holding it are already gone.
+    """
+    change_cart_recipe(instance.user_id, instance.recipe_id, -1)
+
+
+@receiver(post_save, sender=IngredientAmount)
+def change_amount_in_cart_totals(sender, instance, **kwargs):
+    stored = getattr(instance, 'stored_row', None)
+    if stored is not None and (
+        stored.recipe_id, stored.ingredient_id, stored.amount
+    ) == (instance.recipe_id, instance.ingredient_id, instance.amount):
+        return
+    with transaction.atomic():
+        if stored is not None:
+            change_cart_amount(
+                stored.recipe_id, stored.ingredient_id, -stored.amount
+            )
+        change_cart_amount(
+            instance.recipe_id, instance.ingredient_id, instance.amount
+        )
+
+
+@receiver(post_delete, sender=IngredientAmount)
+def remove_amount_from_cart_totals(sender, instance, **kwargs):
+    change_cart_amount(
+        instance.recipe_id, instance.ingredient_id, -instance.amount
+    )
@@ -0,0 +1,735 @@
+import io
+import os
+import threading
+from unittest import mock, skipIf, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+from core.metrics import registry
+from foodgram.models import (FavouriteList, Ingredient, IngredientAmount,
+                             Recipe, ShoppingCartIngredient, ShoppingList,
+                             Subscription, Tag)
+
+from .archive import (RecipeImporter, get_archive_queryset, get_record,
+                      read_archive, write_archive)
+from .async_views import async_view
+from .benchmarks import get_benchmark_user, seed
+from .cache import get_cache, get_stats
+from .checks import check_response_cache
+from .pantry_index import pantry_index
+from .services import (change_counters, get_counter_mismatches,
+                       reconcile_counters)
+from .utils import aggregate_shopping_list
+
+User = get_user_model()
+
+
+class ApiTestCase(TestCase):
+    """Test case with a small synthetic dataset."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(
+            recipes=30, ingredients=40, tags=5, users=10, authors=5,
+            favourites=5, carts=3, subscriptions=4
+        )
+        cls.user = get_benchmark_user(1)
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+
+    def get(self, path, user=None, **params):
+        get_cache().clear()
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        response = client.get(path, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+
+class RecipeQueryBudgetTest(ApiTestCase):
+    """Recipe list and detail make a fixed number of queries."""
+
+    def assert_list_queries(self, queries, user=None):
+        for limit in (2, 20):
+            with self.subTest(limit=limit), self.assertNumQueries(queries):
+                response = self.get('/api/recipes/', user, limit=limit)
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_list_anonymous(self):
+        self.assert_list_queries(4)
+
+    def test_list_authenticated(self):
+        self.assert_list_queries(6, self.user)
+
+    def test_cursor_mode_without_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get('/api/recipes/', pagination='cursor')
+            response = self.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 6)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_retrieve(self):
+        recipe_id = self.get('/api/recipes/').data['results'][0]['id']
+        for user, queries in ((None, 4), (self.user, 7)):
+            with self.subTest(user=user), self.assertNumQueries(queries):
+                self.get(f'/api/recipes/{recipe_id}/', user)
+
+
+class ConditionalGetTest(ApiTestCase):
+    """Recipe responses carry validators and answer 304 on a match."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = Recipe.objects.exclude(
+            foodgram_favouritelist_recipes__user=self.user
+        ).first()
+        self.path = f'/api/recipes/{self.recipe.pk}/'
+        self.client.force_authenticate(self.user)
+
+    def get_etag(self, path=None):
+        return self.get(path or self.path, self.user)['ETag']
+
+    def test_if_none_match(self):
+        etag = self.get_etag()
+        with self.assertNumQueries(2):
+            response = self.client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.content)
+
+    def test_if_modified_since(self):
+        path = f'/api/tags/{Tag.objects.first().pk}/'
+        last_modified = self.get(path)['Last-Modified']
+        response = self.client.get(path, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_no_last_modified_after_delete(self):
+        for path in (self.path, '/api/recipes/', '/api/tags/'):
+            with self.subTest(path=path):
+                self.assertNotIn('Last-Modified', self.get(path, self.user))
+        since = http_date()
+        self.recipe.delete()
+        response = self.client.get(
+            '/api/recipes/', {'limit': 100}, HTTP_IF_MODIFIED_SINCE=since
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(
+            self.recipe.pk, [item['id'] for item in response.data['results']]
+        )
+
+    def assert_etag_changes(self, change):
+        paths = (self.path, '/api/recipes/')
+        etags = [self.get_etag(path) for path in paths]
+        change()
+        for path, etag in zip(paths, etags):
+            with self.subTest(path=path):
+                self.assertNotEqual(self.get_etag(path), etag)
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_recipe_edit(self):
+        self.recipe.cooking_time += 1
+        self.assert_etag_changes(self.recipe.save)
+
+    def test_favourite_toggle(self):
+        favorite = f'{self.path}favorite/'
+        self.assert_etag_changes(lambda: self.client.post(favorite))
+        self.assert_etag_changes(lambda: self.client.delete(favorite))
+
+    def test_tag_edit(self):
+        tag = self.recipe.tags.first()
+        tag.color = '#123456'
+        self.assert_etag_changes(tag.save)
+
+    def test_author_profile_edit(self):
+        author = self.recipe.author
+        author.first_name = 'Другое имя'
+        self.assert_etag_changes(author.save)
+
+
+class ResponseCacheTest(ApiTestCase):
+    """Cached responses are counted and go stale on writes."""
+
+    def fetch(self, path, cached):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response['X-Cache'], 'HIT' if cached else 'MISS')
+        return response
+
+    def test_hits_and_misses(self):
+        before = get_stats()
+        self.fetch('/api/tags/', False)
+        self.fetch('/api/tags/', True)
+        self.fetch('/api/tags/', True)
+        self.fetch('/api/ingredients/', False)
+        after = get_stats()
+        self.assertEqual(after['hits'] - before['hits'], 2)
+        self.assertEqual(after['misses'] - before['misses'], 2)
+
+    def test_invalidation_on_write(self):
+        self.fetch('/api/tags/', False)
+        self.fetch('/api/tags/', True)
+        Tag.objects.create(
+            name='Новый', slug='new-tag', color='#010203',
+            author=self.user, last_editor=self.user
+        )
+        response = self.fetch('/api/tags/', False)
+        self.assertIn('new-tag', [item['slug'] for item in response.data])
+        recipe = Recipe.objects.first()
+        path = f'/api/recipes/{recipe.pk}/'
+        self.fetch(path, False)
+        self.fetch(path, True)
+        author = APIClient()
+        author.force_authenticate(recipe.author)
+        response = author.patch(path, {'name': 'Переименован'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.fetch(path, False).data['name'], 'Переименован')
+
+    def test_local_cache_with_many_workers(self):
+        self.assertEqual(check_response_cache(None), [])
+        with mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '2'}):
+            self.assertEqual(
+                [error.id for error in check_response_cache(None)],
+                ['api.E001']
+            )
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                'LOCATION': 'response_cache',
+            }}):
+                self.assertEqual(check_response_cache(None), [])
+
+
+class SubscriptionFeedTest(ApiTestCase):
+    """Subscription list makes a fixed number of queries."""
+
+    def setUp(self):
+        super().setUp()
+        self.subscriber = get_benchmark_user(9)
+        self.authors = [get_benchmark_user(number) for number in range(5)]
+        Subscription.objects.filter(user=self.subscriber).delete()
+
+    def test_fixed_queries(self):
+        for authors in (2, 5):
+            Subscription.objects.bulk_create(
+                Subscription(user=self.subscriber, author=author)
+                for author in self.authors[:authors]
+            )
+            for recipes_limit in (1, 3):
+                with self.subTest(authors=authors, limit=recipes_limit):
+                    with self.assertNumQueries(3):
+                        response = self.get(
+                            '/api/users/subscriptions/', self.subscriber,
+                            limit=10, recipes_limit=recipes_limit
+                        )
+                    results = response.data['results']
+                    self.assertEqual(len(results), authors)
+                    for author in results:
+                        self.assertEqual(
+                            len(author['recipes']), recipes_limit
+                        )
+            Subscription.objects.filter(user=self.subscriber).delete()
+
+
+class PopularOrderingTest(ApiTestCase):
+    """Popular order is paged by number only."""
+
+    def test_cursor_rejected(self):
+        response = self.client.get(
+            '/api/recipes/', {'ordering': 'popular', 'pagination': 'cursor'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_page_number(self):
+        ids = [
+            item['id'] for item in self.get(
+                '/api/recipes/', ordering='popular', limit=10
+            ).data['results']
+        ]
+        recipes = Recipe.objects.in_bulk(ids)
+        counts = [recipes[pk].favourites_count for pk in ids]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+
+
+class RecipeSearchTest(ApiTestCase):
+    """Recipe search by name, ingredients and description."""
+
+    def setUp(self):
+        super().setUp()
+        self.author = APIClient()
+        self.author.force_authenticate(self.user)
+        self.ingredient = Ingredient.objects.create(
+            name='gooseberry', measurement_unit='г',
+            author=self.user, last_editor=self.user
+        )
+        self.recipes = [
+            self.create_recipe(name, text, ingredient)
+            for name, text, ingredient in (
+                ('Gooseberry pie', 'Bake it.', self.ingredient),
+                ('Summer jam', 'Boil it.', self.ingredient),
+                ('Morning porridge', 'Add gooseberry on top.', None),
+                ('Plain toast', 'Toast it.', None),
+            )
+        ]
+
+    def create_recipe(self, name, text, ingredient=None):
+        if ingredient is None:
+            ingredient = Ingredient.objects.exclude(
+                pk=self.ingredient.pk
+            ).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                name=name, text=text, cooking_time=10,
+                image='recipes/benchmark.png',
+                image_variants={'source': 'recipes/benchmark.png'},
+                author=self.user, last_editor=self.user
+            )
+            IngredientAmount.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1
+            )
+        return recipe.pk
+
+    def search(self, query):
+        return [
+            item['id'] for item in self.get(
+                '/api/recipes/', search=query, limit=100
+            ).data['results']
+        ]
+
+    def test_cursor_rejected(self):
+        response = self.client.get(
+            '/api/recipes/', {'search': 'pie', 'pagination': 'cursor'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    @skipIf(connection.vendor == 'postgresql', 'substring fallback')
+    def test_substring_match(self):
+        self.assertEqual(
+            sorted(self.search('GOOSEBERRY')), sorted(self.recipes[:3])
+        )
+        self.assertEqual(self.search('toast'), [self.recipes[3]])
+        self.assertEqual(self.search('oast i'), [self.recipes[3]])
+
+    @skipUnless(connection.vendor == 'postgresql', 'full text search')
+    def test_ranked_match(self):
+        found = self.search('gooseberry')
+        self.assertEqual(found[0], self.recipes[0])
+        self.assertEqual(sorted(found), sorted(self.recipes[:3]))
+        self.assertEqual(self.search('Gooseberri pie')[0], self.recipes[0])
+
+    def test_edit(self):
+        recipe_id = self.recipes[3]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.author.patch(f'/api/recipes/{recipe_id}/', {
+                'name': 'Rhubarb toast',
+                'tags': [Tag.objects.first().pk],
+                'ingredients': [{'id': self.ingredient.pk, 'amount': 2}],
+            }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.search('rhubarb'), [recipe_id])
+        self.assertIn(recipe_id, self.search('gooseberry'))
+        self.assertEqual(self.search('plain'), [])
+
+
+class ConsistencyTest(ApiTestCase):
+    """Counters and shopping list totals follow the lists."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = Recipe.objects.exclude(author=self.user).exclude(
+            foodgram_favouritelist_recipes__user=self.user
+        ).exclude(foodgram_shoppinglist_recipes__user=self.user).first()
+        self.client.force_authenticate(self.user)
+
+    def assert_counters(self):
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            self.recipe.favourites_count,
+            self.recipe.foodgram_favouritelist_recipes.count()
+        )
+        self.assertEqual(
+            self.recipe.shopping_cart_count,
+            self.recipe.foodgram_shoppinglist_recipes.count()
+        )
+        author = self.recipe.author
+        author.refresh_from_db()
+        self.assertEqual(author.followers_count, author.following.count())
+
+    def test_counters_under_repeated_add_and_remove(self):
+        paths = (
+            f'/api/recipes/{self.recipe.pk}/favorite/',
+            f'/api/recipes/{self.recipe.pk}/shopping_cart/',
+            f'/api/users/{self.recipe.author_id}/subscribe/',
+        )
+        for _ in range(3):
+            for path in paths:
+                self.client.post(path)
+                self.client.post(path)
+            self.assert_counters()
+            for path in paths:
+                self.client.delete(path)
+                self.client.delete(path)
+            self.assert_counters()
+        change_counters(
+            Recipe.objects.filter(pk=self.recipe.pk), favourites_count=-5
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favourites_count, 0)
+
+    def test_counters_orm(self):
+        def assert_no_drift():
+            self.assertFalse(any(get_counter_mismatches().values()))
+
+        other = Recipe.objects.exclude(pk=self.recipe.pk).exclude(
+            foodgram_favouritelist_recipes__user=self.user
+        ).exclude(author=self.user).first()
+        favourite = FavouriteList.objects.create(
+            user=self.user, recipe=self.recipe
+        )
+        ShoppingList.objects.create(user=self.user, recipe=self.recipe)
+        Subscription.objects.get_or_create(
+            user=self.user, author=other.author
+        )
+        assert_no_drift()
+        favourite.recipe = other
+        favourite.save()
+        assert_no_drift()
+        self.recipe.delete()
+        assert_no_drift()
+        self.user.delete()
+        assert_no_drift()
+
+    def test_reconcile_repairs_drift(self):
+        Recipe.objects.update(favourites_count=F('favourites_count') + 3)
+        User.objects.update(followers_count=0, recipes_count=0)
+        self.assertTrue(any(get_counter_mismatches().values()))
+        reconcile_counters()
+        self.assertFalse(any(get_counter_mismatches().values()))
+        self.assert_counters()
+
+    def assert_totals(self):
+        stored = aggregate_shopping_list(
+            ShoppingCartIngredient.objects.filter(user=self.user),
+            'total_amount'
+        )
+        computed = aggregate_shopping_list(
+            IngredientAmount.objects.filter(
+                recipe__foodgram_shoppinglist_recipes__user=self.user
+            ),
+            'amount'
+        )
+        self.assertEqual(list(stored), list(computed))
+
+    def test_cart_totals(self):
+        path = f'/api/recipes/{self.recipe.pk}/shopping_cart/'
+        self.assert_totals()
+        self.client.post(path)
+        self.assert_totals()
+        amounts = list(IngredientAmount.objects.filter(
+            recipe=self.recipe
+        ).values_list('ingredient_id', 'amount'))
+        ingredients = [
+            {'id': ingredient_id, 'amount': amount + 5}
+            for ingredient_id, amount in amounts[1:]
+        ] + [{'id': Ingredient.objects.exclude(
+            pk__in=[ingredient_id for ingredient_id, _ in amounts]
+        ).first().pk, 'amount': 7}]
+        author = APIClient()
+        author.force_authenticate(self.recipe.author)
+        response = author.patch(
+            f'/api/recipes/{self.recipe.pk}/',
+            {
+                'ingredients': ingredients,
+                'tags': list(self.recipe.tags.values_list('pk', flat=True)),
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assert_totals()
+        self.client.delete(path)
+        self.assert_totals()
+        self.client.post(path)
+        author.delete(f'/api/recipes/{self.recipe.pk}/')
+        self.assertFalse(Recipe.objects.filter(pk=self.recipe.pk).exists())
+        self.assert_totals()
+
+    def test_cart_totals_orm(self):
+        # the first benchmark user wrote the ingredient catalog,
+        # deleting that user would empty every shopping list
+        other = Recipe.objects.exclude(pk=self.recipe.pk).exclude(
+            author__in=[self.user, get_benchmark_user()]
+        ).exclude(foodgram_shoppinglist_recipes__user=self.user).first()
+        item = ShoppingList.objects.create(user=self.user, recipe=self.recipe)
+        self.assert_totals()
+        item.recipe = other
+        item.save()
+        self.assert_totals()
+        amount = other.ingredient_amounts.first()
+        amount.amount += 11
+        amount.save()
+        self.assert_totals()
+        IngredientAmount.objects.create(
+            recipe=other, amount=3, ingredient=Ingredient.objects.exclude(
+                ingredient_amounts__recipe=other
+            ).first()
+        )
+        self.assert_totals()
+        amount.delete()
+        self.assert_totals()
+        other.ingredient_amounts.first().ingredient.delete()
+        self.assert_totals()
+        ShoppingList.objects.create(user=self.user, recipe=self.recipe)
+        self.recipe.delete()
+        self.assert_totals()
+        ShoppingList.objects.get_or_create(
+            user=self.user, recipe=Recipe.objects.exclude(
+                author=other.author
+            ).filter(ingredient_amounts__isnull=False).first()
+        )
+        other.author.delete()
+        self.assert_totals()
+        self.assertTrue(
+            ShoppingCartIngredient.objects.filter(user=self.user).exists()
+        )
+
+
+class PantryRankingTest(ApiTestCase):
+    """Pantry ranks recipes by the share of their ingredients on hand."""
+
+    def setUp(self):
+        super().setUp()
+        pantry_index.invalidate()
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f'pantry-{number}', measurement_unit='г',
+                author=self.user, last_editor=self.user
+            ) for number in range(5)
+        ]
+        self.recipes = {}
+        for name, numbers in (
+            ('a', (0, 1)), ('b', (0, 1, 2, 3)), ('c', (0, 1, 2)),
+            ('d', (0, 4)), ('e', (0, 1)),
+        ):
+            recipe = self.recipes[name] = Recipe.objects.create(
+                name=f'pantry-{name}', text='Pantry recipe.',
+                image='recipes/benchmark.png', cooking_time=1,
+                image_variants={'source': 'recipes/benchmark.png'},
+                author=self.user, last_editor=self.user
+            )
+            self.set_ingredients(recipe, numbers)
+
+    def set_ingredients(self, recipe, numbers):
+        IngredientAmount.objects.bulk_create([
+            IngredientAmount(
+                recipe=recipe, ingredient=self.ingredients[number], amount=1
+            ) for number in numbers
+        ])
+
+    def match(self, numbers, **params):
+        ingredients = [self.ingredients[number].pk for number in numbers]
+        return [
+            (item['name'][len('pantry-'):], item['matched_count'],
+             item['ingredients_count'])
+            for item in self.get(
+                '/api/recipes/pantry/', ingredients=ingredients, **params
+            ).data
+        ]
+
+    def test_ranking(self):
+        self.assertEqual(self.match((0, 1, 2)), [
+            ('c', 3, 3), ('e', 2, 2), ('a', 2, 2), ('b', 3, 4), ('d', 1, 2)
+        ])
+        self.assertEqual(self.match((0, 1, 2), limit=2), [
+            ('c', 3, 3), ('e', 2, 2)
+        ])
+        self.assertEqual(self.match((4,)), [('d', 1, 2)])
+        response = self.get(
+            '/api/recipes/pantry/', ingredients=self.ingredients[0].pk
+        )
+        self.assertEqual(
+            [item['coverage'] for item in response.data],
+            [0.5, 0.5, 0.5, 0.3333, 0.25]
+        )
+
+    def test_index_updates(self):
+        self.match((0,))
+        b, d = self.recipes['b'], self.recipes['d']
+        pantry_index.update_recipe(
+            b.pk, [self.ingredients[number].pk for number in (0, 1, 2)]
+        )
+        pantry_index.remove_recipe(self.recipes['c'].pk)
+        self.assertEqual(self.match((0, 1, 2)), [
+            ('b', 3, 3), ('e', 2, 2), ('a', 2, 2), ('d', 1, 2)
+        ])
+        author = APIClient()
+        author.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = author.patch(
+                f'/api/recipes/{d.pk}/',
+                {
+                    'ingredients': [
+                        {'id': self.ingredients[number].pk, 'amount': 1}
+                        for number in (1, 2)
+                    ],
+                    'tags': [Tag.objects.first().pk],
+                },
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.match((0, 1, 2)), [
+            ('b', 3, 3), ('e', 2, 2), ('d', 2, 2), ('a', 2, 2)
+        ])
+        with self.captureOnCommitCallbacks(execute=True):
+            author.delete(f'/api/recipes/{d.pk}/')
+        self.assertEqual(self.match((1,)), [
+            ('e', 1, 2), ('a', 1, 2), ('b', 1, 3)
+        ])
+
+
+class ArchiveTest(ApiTestCase):
+    """Exported recipes are imported back as they were."""
+
+    def get_records(self):
+        return [
+            get_record(recipe)
+            for recipe in get_archive_queryset().order_by('name')
+        ]
+
+    def import_archive(self, content):
+        importer = RecipeImporter(self.user)
+        return importer.run(read_archive(io.StringIO(content)), 7)
+
+    def test_round_trip(self):
+        records = self.get_records()
+        recipes_counts = dict(
+            User.objects.values_list('username', 'recipes_count')
+        )
+        file = io.StringIO()
+        self.assertEqual(write_archive(file, batch_size=7), len(records))
+        ingredient_id = IngredientAmount.objects.first().ingredient_id
+        pantry_index.invalidate()
+        self.assertTrue(pantry_index.match([ingredient_id]))
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.all().delete()
+        self.assertEqual(pantry_index.match([ingredient_id]), [])
+        stats = self.import_archive(file.getvalue())
+        self.assertEqual(stats['created'], len(records))
+        self.assertEqual(stats['skipped'], 0)
+        self.assertEqual(self.get_records(), records)
+        self.assertEqual(
+            dict(User.objects.values_list('username', 'recipes_count')),
+            recipes_counts
+        )
+        self.assertEqual(
+            {recipe_id for recipe_id, _, _ in pantry_index.match(
+                [ingredient_id], 100
+            )},
+            set(Recipe.objects.filter(
+                ingredient_amounts__ingredient_id=ingredient_id
+            ).values_list('pk', flat=True))
+        )
+        stats = self.import_archive(file.getvalue())
+        self.assertEqual(stats['created'], 0)
+        self.assertEqual(stats['skipped'], len(records))
+        self.assertEqual(self.get_records(), records)
+
+
+class TagFilterTest(ApiTestCase):
+    """Recipe tag filter."""
+
+    def test_any_of_tags(self):
+        slugs = ['benchmark-tag-0', 'benchmark-tag-1', 'benchmark-tag-2']
+        ids = [
+            item['id'] for item in self.get(
+                '/api/recipes/', tags=slugs, limit=100
+            ).data['results']
+        ]
+        expected = set(Recipe.objects.filter(
+            tags__slug__in=slugs
+        ).values_list('pk', flat=True))
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), expected)
+        self.assertGreater(
+            Recipe.tags.through.objects.filter(
+                tag__slug__in=slugs, recipe_id__in=expected
+            ).count(),
+            len(expected)
+        )
+
+    def test_unknown_tag(self):
+        response = self.client.get(
+            '/api/recipes/', {'tags': ['benchmark-tag-0', 'unknown']}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tags', response.data)
+
+    def test_tag_created_elsewhere(self):
+        self.get('/api/recipes/', tags=['benchmark-tag-0'])
+        recipe = Recipe.objects.first()
+        # no signals, as if created by another process
+        Tag.objects.bulk_create([Tag(
+            name='Новый', slug='new-tag', color='#010203',
+            author=self.user, last_editor=self.user
+        )])
+        recipe.tags.add(Tag.objects.get(slug='new-tag'))
+        response = self.client.get('/api/recipes/', {'tags': 'new-tag'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            [item['id'] for item in response.data['results']], [recipe.pk]
+        )
+
+
+@override_settings(METRICS_ENABLED=True)
+class SerializationMetricsTest(ApiTestCase):
+    """Serialization time is measured apart from the rest of a request."""
+
+    def get_sums(self, labels):
+        return [
+            metric.values.get(labels, [0])[-1] for metric in (
+                registry.duration, registry.db_duration,
+                registry.serialization_duration
+            )
+        ]
+
+    def test_recipe_list(self):
+        labels = ('recipes-list', 'GET')
+        before = self.get_sums(labels)
+        self.get('/api/recipes/', self.user, limit=20)
+        seconds, db_seconds, serialization_seconds = [
+            after - start
+            for after, start in zip(self.get_sums(labels), before)
+        ]
+        self.assertGreater(db_seconds, 0)
+        self.assertGreater(serialization_seconds, 0)
+        self.assertLess(serialization_seconds + db_seconds, seconds)
+
+
+class AsyncViewTest(SimpleTestCase):
+    """Only reads of async routes run in the view thread pool."""
+
+    def test_methods(self):
+        threads = {}
+
+        def view(request):
+            threads[request.method] = threading.current_thread().name
+            return HttpResponse()
+
+        factory = RequestFactory()
+        for method in ('get', 'head', 'post', 'patch', 'delete'):
+            async_to_sync(async_view(view))(getattr(factory, method)('/'))
+        for method, thread in threads.items():
+            with self.subTest(method=method):
+                self.assertEqual(
+                    thread.startswith('async-view'),
+                    method in ('GET', 'HEAD')
+                )
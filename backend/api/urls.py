@@ -2,6 +2,7 @@ from django.urls import include, path
 from djoser.views import TokenCreateView, TokenDestroyView
 from rest_framework import routers
 
+from .async_views import get_async_patterns
 from .views import (FavouriteListViewSet, IngredientViewSet, RecipeViewSet,
                     ShoppingListViewSet, SubscriptionListViewSet, TagViewSet)
 
@@ -36,7 +37,7 @@ urlpatterns = [
         'recipes/download_shopping_cart/',
         ShoppingListViewSet.as_view(
             {'get': 'list'}
-        ), name='shopping_cart'
+        ), name='download_shopping_cart'
     ),
     path('', include('djoser.urls')),
     path('auth/token/login/', TokenCreateView.as_view(), name='token_obtain'),
@@ -45,6 +46,7 @@ urlpatterns = [
         TokenDestroyView.as_view(),
         name='token_destroy'
     ),
-    path('', include(router.urls))
+    path('', include(get_async_patterns(router.urls)))
 
 ]
+urlpatterns = get_async_patterns(urlpatterns)
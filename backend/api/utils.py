@@ -1,24 +1,165 @@
+import csv
+import os
+import tempfile
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.db.models import (Case, CharField, F, IntegerField, Min, Sum,
+                              Value, When)
+from django.db.models.functions import Lower, Trim
 from core.exceptions import InvalidShoppingListDataError
 
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+except ImportError:
+    canvas = None
+
+# units summed together with their base unit: unit -> (base unit, factor)
+UNIT_CONVERSIONS = {
+    'кг': ('г', 1000),
+    'л': ('мл', 1000),
+}
+SHOPPING_LIST_TITLE = 'FOODGRAM список покупок для пользователя {username}'
+
+
+def get_recipes_limit(request):
+    """Return positive recipes_limit query param or None."""
+    try:
+        recipes_limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return None
+    return recipes_limit if recipes_limit > 0 else None
+
+
+def get_int_list_param(request, name):
+    """Return list of ints from a repeated query param or None."""
+    try:
+        return [int(value) for value in request.query_params.getlist(name)]
+    except ValueError:
+        return None
+
+
+def aggregate_shopping_list(queryset, amount_field):
+    """
+    Sum ingredient amounts of the queryset in the database,
+    merging spelling variants of a name and convertible units.
+    """
+    factor = Case(
+        *[
+            When(ingredient__measurement_unit=unit, then=Value(multiplier))
+            for unit, (_, multiplier) in UNIT_CONVERSIONS.items()
+        ],
+        default=Value(1),
+        output_field=IntegerField()
+    )
+    unit = Case(
+        *[
+            When(ingredient__measurement_unit=unit, then=Value(base_unit))
+            for unit, (base_unit, _) in UNIT_CONVERSIONS.items()
+        ],
+        default=F('ingredient__measurement_unit'),
+        output_field=CharField()
+    )
+    return queryset.annotate(
+        name_key=Lower(Trim('ingredient__name')),
+        unit=unit
+    ).values('name_key', 'unit').annotate(
+        name=Min(Trim('ingredient__name')),
+        amount_sum=Sum(F(amount_field) * factor)
+    ).order_by('name_key', 'unit')
+
+
+def generate_shopping_list(ingredients, username: str):
+    """Yield shopping list for given user line by line."""
+    yield SHOPPING_LIST_TITLE.format(username=username) + '\n\n'
+    try:
+        for i, item in enumerate(ingredients, start=1):
+            yield (
+                f'{i}. '
+                f'{item["name"]} '
+                f'({item["unit"]}) - '
+                f'{item["amount_sum"]}\n'
+            )
+    except (KeyError, TypeError) as e:
+        raise InvalidShoppingListDataError(e)
+
+
+class Echo:
+    """File-like object returning written value for csv.writer."""
+
+    def write(self, value):
+        return value
+
 
-def generate_shopping_list(ingredients: list, username: str) -> list:
-    """Create shopping list for given user."""
+def generate_shopping_list_csv(ingredients, username: str):
+    """Yield shopping list as csv rows."""
+    writer = csv.writer(Echo())
+    # byte order mark lets spreadsheet apps detect utf-8
+    yield '\ufeff' + writer.writerow(['name', 'measurement_unit', 'amount'])
     try:
-        shopping_list = [
-            (
-                f'FOODGRAM список покупок '
-                f'для пользователя {username}\n\n'
+        for item in ingredients:
+            yield writer.writerow(
+                [item['name'], item['unit'], item['amount_sum']]
             )
-        ]
+    except (KeyError, TypeError) as e:
+        raise InvalidShoppingListDataError(e)
+
+
+def generate_shopping_list_pdf(ingredients, username: str):
+    """
+    Render shopping list to pdf in a temporary file, which spills
+    to disk for big lists, and return it as a chunked iterator.
+    Unlike txt and csv the pdf is not streamed: reportlab keeps pages
+    until save() writes the cross-reference table of their offsets,
+    so the first byte is sent once the whole document is rendered.
+    """
+    font_name = 'ShoppingListFont'
+    if font_name not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(font_name, settings.SHOPPING_LIST_PDF_FONT)
+        )
+    output = tempfile.SpooledTemporaryFile(
+        max_size=settings.SHOPPING_LIST_SPOOL_SIZE
+    )
+    pdf = canvas.Canvas(output, pagesize=A4)
+    _, height = A4
+    margin, line_height, font_size = 50, 18, 12
+    pdf.setFont(font_name, font_size + 2)
+    pdf.drawString(
+        margin, height - margin,
+        SHOPPING_LIST_TITLE.format(username=username)
+    )
+    y = height - margin - 2 * line_height
+    pdf.setFont(font_name, font_size)
+    try:
         for i, item in enumerate(ingredients, start=1):
-            shopping_list.append(
-                (
-                    f'{i}. '
-                    f'{item["ingredient__name"]} '
-                    f'({item["ingredient__measurement_unit"]}) - '
-                    f'{item["amount_sum"]}\n'
-                )
+            if y < margin:
+                pdf.showPage()
+                pdf.setFont(font_name, font_size)
+                y = height - margin
+            pdf.drawString(
+                margin, y,
+                f'{i}. {item["name"]} ({item["unit"]}) - '
+                f'{item["amount_sum"]}'
             )
-        return shopping_list
-    except Exception as e:
+            y -= line_height
+    except (KeyError, TypeError) as e:
+        output.close()
         raise InvalidShoppingListDataError(e)
+    pdf.save()
+    output.seek(0)
+    return FileWrapper(output)
+
+
+# file format -> (content type, generator)
+SHOPPING_LIST_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', generate_shopping_list),
+    'csv': ('text/csv; charset=utf-8', generate_shopping_list_csv),
+}
+if canvas is not None and os.path.exists(settings.SHOPPING_LIST_PDF_FONT):
+    SHOPPING_LIST_FORMATS['pdf'] = (
+        'application/pdf', generate_shopping_list_pdf
+    )
@@ -1,57 +1,224 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import OuterRef, Prefetch, Subquery
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import status, viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from core.pagination import CursorOrPageNumberPagination
 from core.permissions import AuthorAdminOrReadOnly
-from foodgram.models import Ingredient, IngredientAmount, Recipe, Tag
+from foodgram.models import (Ingredient, IngredientAmount, Recipe,
+                             ShoppingCartIngredient, Tag)
 
 from .fitlers import IngredientFilter, RecipeFilter
-from .mixins import AutoAddAuthorEditorMixin, DestroyMixin, ListRetrieveMixin
+from .ingredient_index import ingredient_index
+from .mixins import (AutoAddAuthorEditorMixin, CachedResponseMixin,
+                     DestroyMixin, ListRetrieveMixin, ReplicaReadMixin,
+                     SerializationMetricsMixin)
+from .pantry_index import pantry_index
+from .services import get_user_relations_state
 from .serializers import (FavouriteListSerializer, IngredientSerializer,
-                          RecipeCreateUpdateSerializer, RecipeViewSerializer,
-                          ShoppingListSerializer, SubscriptionSerializer,
-                          TagSerializer)
-from .utils import generate_shopping_list
+                          PantryRecipeSerializer, RecipeCreateUpdateSerializer,
+                          RecipeViewSerializer, ShoppingListSerializer,
+                          SubscriptionSerializer, TagSerializer)
+from .utils import (SHOPPING_LIST_FORMATS, aggregate_shopping_list,
+                    get_int_list_param, get_recipes_limit)
 
 User = get_user_model()
 
 
-class TagViewSet(ListRetrieveMixin):
+class TagViewSet(
+    SerializationMetricsMixin,
+    ReplicaReadMixin,
+    CachedResponseMixin,
+    ListRetrieveMixin
+):
     """Viewset to retrieve tags."""
 
+    cache_namespace = 'tags'
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
     permission_classes = [AllowAny]
     pagination_class = None
 
 
-class IngredientViewSet(ListRetrieveMixin):
+class IngredientViewSet(
+    SerializationMetricsMixin,
+    ReplicaReadMixin,
+    CachedResponseMixin,
+    ListRetrieveMixin
+):
     """Viewset to retrieve ingredients."""
 
+    cache_namespace = 'ingredients'
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
     permission_classes = [AllowAny]
     filterset_class = IngredientFilter
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        """Answer name autocomplete from the in-memory index."""
+        if not request.query_params.get('name'):
+            return super().list(request, *args, **kwargs)
+        return self.get_conditional_response(request, self.search)
+
+    def get_validated_queryset(self):
+        """Search results depend on the whole catalog."""
+        if self.action == 'list':
+            return self.get_queryset()
+        return super().get_validated_queryset()
+
+    def search(self, request):
+        return Response(
+            ingredient_index.search(request.query_params['name'])
+        )
+
 
-class RecipeViewSet(AutoAddAuthorEditorMixin, viewsets.ModelViewSet):
+class RecipeViewSet(
+    SerializationMetricsMixin,
+    AutoAddAuthorEditorMixin,
+    ReplicaReadMixin,
+    CachedResponseMixin,
+    viewsets.ModelViewSet
+):
     """Vieset for recipes."""
 
+    cache_namespace = 'recipes'
+    cache_anonymous_only = True
+    validated_related_models = (Tag, Ingredient, User)
+    pagination_class = CursorOrPageNumberPagination
     permission_classes = [AuthorAdminOrReadOnly]
-    queryset = Recipe.objects.all()
     filterset_class = RecipeFilter
 
+    cursor_ordering = ('-date_modified', '-id')
+
+    def is_popular_ordering(self):
+        return self.request.query_params.get('ordering') == 'popular'
+
+    def get_cursor_conflict(self, request):
+        """
+        Keyset pages of DRF encode the first ordering field only and
+        replace any other order: favourites_count changes all the time
+        and has long runs of ties, search results are ranked by
+        relevance, so both are paged by number only.
+        """
+        if self.is_popular_ordering():
+            return 'сортировка popular'
+        if request.query_params.get('search'):
+            return 'поиск'
+        return None
+
+    def list(self, request, *args, **kwargs):
+        conflict = self.get_cursor_conflict(request)
+        if conflict and self.paginator.is_cursor_mode(request):
+            return Response(
+                {'errors': f'{conflict} не поддерживает pagination=cursor'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return super().list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        """
+        Load everything the recipe serializers need in a fixed
+        number of queries, whatever the page size is.
+        """
+        return Recipe.objects.select_related('author').defer(
+            'search_vector'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredient_amounts',
+                queryset=IngredientAmount.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
+
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeViewSerializer
         return RecipeCreateUpdateSerializer
 
+    def get_validated_base_queryset(self):
+        return Recipe.objects.all()
+
+    def get_conditional_response(self, request, handler, *args, **kwargs):
+        """
+        Popular order changes with every favourite without touching
+        date_modified, so it is neither cached nor validated.
+        """
+        if self.action == 'list' and self.is_popular_ordering():
+            return handler(request, *args, **kwargs)
+        return super().get_conditional_response(
+            request, handler, *args, **kwargs
+        )
+
+    def should_validate(self, request):
+        """
+        Keyset pages skip the validators, their COUNT over all
+        filtered recipes is what the cursor mode avoids.
+        """
+        return super().should_validate(request) and not (
+            self.action == 'list' and self.paginator.is_cursor_mode(request)
+        )
+
+    def get_validators_state(self, request):
+        """
+        Account for the user's favourites, shopping list
+        and subscriptions shown inside recipes.
+        """
+        state, last_modified = super().get_validators_state(request)
+        if request.user.is_authenticated:
+            state.extend(get_user_relations_state(request.user))
+        return state, last_modified
 
-class FavouriteListViewSet(DestroyMixin, viewsets.ModelViewSet):
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'list':
+            context['image_variant'] = 'thumbnail'
+        return context
+
+    @action(detail=False, permission_classes=[AllowAny])
+    def pantry(self, request):
+        """
+        Rank recipes by the share of their ingredients among
+        ?ingredients= ids the user has on hand.
+        """
+        ingredient_ids = get_int_list_param(request, 'ingredients')
+        if not ingredient_ids:
+            return Response(
+                {'errors': 'укажите id имеющихся ингредиентов'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = int(request.query_params.get('limit'))
+        except (TypeError, ValueError):
+            limit = settings.PANTRY_MATCH_LIMIT
+        limit = min(max(limit, 1), settings.PANTRY_MATCH_MAX_LIMIT)
+        matches = pantry_index.match(ingredient_ids, limit)
+        recipes = Recipe.objects.defer('search_vector').in_bulk(
+            [recipe_id for recipe_id, _, _ in matches]
+        )
+        result = []
+        for recipe_id, matched_count, ingredients_count in matches:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.matched_count = matched_count
+            recipe.ingredients_count = ingredients_count
+            recipe.coverage = round(matched_count / ingredients_count, 4)
+            result.append(recipe)
+        return Response(PantryRecipeSerializer(
+            result, many=True, context=self.get_serializer_context()
+        ).data)
+
+
+class FavouriteListViewSet(
+    SerializationMetricsMixin, DestroyMixin, viewsets.ModelViewSet
+):
     """Viewset for recipes favourite list."""
 
     serializer_class = FavouriteListSerializer
@@ -72,18 +239,48 @@ class FavouriteListViewSet(DestroyMixin, viewsets.ModelViewSet):
         return super().create(request, *args, **kwargs)
 
 
-class SubscriptionListViewSet(DestroyMixin, viewsets.ModelViewSet):
+class SubscriptionListViewSet(
+    SerializationMetricsMixin, DestroyMixin, viewsets.ModelViewSet
+):
     """Viewset for subscription list."""
 
     serializer_class = SubscriptionSerializer
     permission_classes = [AuthorAdminOrReadOnly]
     lookup_field = 'author_id'
+    pagination_class = CursorOrPageNumberPagination
+    cursor_ordering = ('-date_created', '-id')
 
     def get_queryset(self):
-        return self.request.user.follower.all()
+        """
+        Load authors and at most recipes_limit latest recipes
+        of every author in a fixed number of queries for the list.
+        """
+        if self.action != 'list':
+            return self.request.user.follower.all()
+        recipes = Recipe.objects.defer('search_vector').order_by(
+            '-date_modified', '-id'
+        )
+        recipes_limit = get_recipes_limit(self.request)
+        if recipes_limit:
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).order_by('-date_modified', '-id').values('id')[
+                    :recipes_limit
+                ]
+            ))
+        return self.request.user.follower.select_related(
+            'author'
+        ).prefetch_related(Prefetch(
+            'author__foodgram_recipe_authors',
+            queryset=recipes,
+            to_attr='feed_recipes'
+        ))
 
 
-class ShoppingListViewSet(DestroyMixin, viewsets.ModelViewSet):
+class ShoppingListViewSet(
+    SerializationMetricsMixin, DestroyMixin, viewsets.ModelViewSet
+):
     """Viewset for shopping list."""
 
     serializer_class = ShoppingListSerializer
@@ -93,26 +290,48 @@ class ShoppingListViewSet(DestroyMixin, viewsets.ModelViewSet):
     def get_queryset(self):
         return self.request.user.foodgram_shoppinglist_users.all()
 
+    def create(self, request, *args, **kwargs):
+        recipe = get_object_or_404(Recipe, id=kwargs.get('recipe_id'))
+        if request.user.foodgram_shoppinglist_users.filter(
+                recipe=recipe).exists():
+            return Response(
+                {'errors': 'Этот рецепт уже в списке покупок!'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return super().create(request, *args, **kwargs)
+
     def list(self, request, *args, **kwargs):
-        """Get shopping list as plain text."""
-        recipes = request.user.foodgram_shoppinglist_users.values('recipe')
-        ingredients = IngredientAmount.objects.filter(
-            recipe__in=recipes).values(
-                'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(amount_sum=Sum('amount'))
-        if not ingredients:
+        """Stream shopping list in the requested file format."""
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in SHOPPING_LIST_FORMATS:
             return Response(
-                {'errors': 'список покупок пуст'},
+                {'errors': (
+                    'неизвестный формат файла, доступные форматы: '
+                    f'{", ".join(SHOPPING_LIST_FORMATS)}'
+                )},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        shopping_list = generate_shopping_list(
-            ingredients, request.user.username
+        ingredients = aggregate_shopping_list(
+            ShoppingCartIngredient.objects.filter(user=request.user),
+            'total_amount'
         )
-        response = HttpResponse(
-            shopping_list, status=status.HTTP_200_OK,
-            content_type='text/plain'
+        if not ingredients.exists():
+            return Response(
+                {'errors': 'список покупок пуст'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        content_type, generate = SHOPPING_LIST_FORMATS[file_format]
+        response = StreamingHttpResponse(
+            generate(
+                ingredients.iterator(
+                    chunk_size=settings.SHOPPING_LIST_CHUNK_SIZE
+                ),
+                request.user.username
+            ),
+            status=status.HTTP_200_OK,
+            content_type=content_type
         )
         response['Content-Disposition'] = (
-            'attachment; filename="my_shopping_list.txt"'
+            f'attachment; filename="my_shopping_list.{file_format}"'
         )
         return response
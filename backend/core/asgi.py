@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers import asgi
+from django.db import connections
+
+
+def read_part(iterator):
+    return next(iterator, None)
+
+
+def close_stream(response):
+    """Close the response and the connections of the stream thread."""
+    try:
+        response.close()
+    finally:
+        connections.close_all()
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """
+    Handler reading streamed content in a thread of its own, one part
+    at a time. Django 3.2 reads it in the event loop, where content
+    made by database queries cannot be read at all. One thread keeps
+    the database cursor of the content in the same connection.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        # the same headers as the stock handler sends
+        response_headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            response_headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            response_headers.append((
+                b'Set-Cookie', cookie.output(header='').encode('ascii').strip()
+            ))
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': response_headers,
+        })
+        executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='asgi-stream'
+        )
+        try:
+            read = sync_to_async(
+                read_part, thread_sensitive=False, executor=executor
+            )
+            iterator = iter(response)
+            part = await read(iterator)
+            while part is not None:
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+                part = await read(iterator)
+            await send({'type': 'http.response.body'})
+        finally:
+            await sync_to_async(
+                close_stream, thread_sensitive=False, executor=executor
+            )(response)
+            executor.shutdown(wait=False)
+
+
+def get_asgi_application():
+    django.setup(set_prefix=False)
+    return ASGIHandler()
@@ -0,0 +1,112 @@
+import threading
+
+import psycopg2.extensions
+import psycopg2.extras
+from django.db.backends.postgresql import base
+
+
+class ConnectionPool:
+    """Open connections shared by the threads of one process."""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.slots = threading.BoundedSemaphore(size)
+        self.timeout = timeout
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def get(self, connect, check=None):
+        """
+        Take an idle connection, passing the check if given,
+        or open a new one, waiting while all are taken.
+        """
+        if not self.slots.acquire(timeout=self.timeout):
+            raise base.Database.OperationalError(
+                f'все {self.size} соединений пула заняты'
+            )
+        try:
+            while True:
+                with self.lock:
+                    connection = self.idle.pop() if self.idle else None
+                if connection is None:
+                    return connect()
+                if check is None or check(connection):
+                    return connection
+                connection.close()
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def put(self, connection):
+        """Return connection, rolled back, or close it if it is broken."""
+        try:
+            status = connection.info.transaction_status
+            if status in (
+                psycopg2.extensions.TRANSACTION_STATUS_INTRANS,
+                psycopg2.extensions.TRANSACTION_STATUS_INERROR
+            ):
+                connection.rollback()
+            elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                connection.close()
+                return
+            with self.lock:
+                self.idle.append(connection)
+        except psycopg2.Error:
+            connection.close()
+        finally:
+            self.slots.release()
+
+
+def ping(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not connection.autocommit:
+            connection.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend taking connections from a pool of POOL_SIZE
+    connections per process and giving them back on close.
+    Pooled connections are checked before reuse with CONN_HEALTH_CHECKS.
+    """
+
+    pools = {}
+    pools_lock = threading.Lock()
+
+    def get_pool(self):
+        key = (self.alias, self.settings_dict['NAME'])
+        with self.pools_lock:
+            if key not in self.pools:
+                self.pools[key] = ConnectionPool(
+                    self.settings_dict.get('POOL_SIZE', 10),
+                    self.settings_dict.get('POOL_TIMEOUT', 10)
+                )
+            return self.pools[key]
+
+    @base.async_unsafe
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool().get(
+            lambda: base.Database.connect(**conn_params),
+            ping if self.settings_dict.get('CONN_HEALTH_CHECKS') else None
+        )
+        # the same setup as the stock backend makes for new connections
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get(
+            'isolation_level', connection.isolation_level
+        )
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.get_pool().put(self.connection)
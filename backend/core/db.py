@@ -0,0 +1,72 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.signals import request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.dispatch import receiver
+
+REPLICA_DB_ALIAS = 'replica'
+
+# state of the current read_from_replica() block
+_replica_reads = ContextVar('replica_reads', default=None)
+
+
+def has_replica():
+    return REPLICA_DB_ALIAS in connections.databases
+
+
+@contextmanager
+def read_from_replica():
+    """Send reads made inside the block to the replica, if there is one."""
+    token = _replica_reads.set({'wrote': False})
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Route reads inside read_from_replica() to the replica database,
+    everything else and all writes to the primary one.
+    Reads inside a transaction on the primary and reads after
+    a write in the block stay there, to see what was written.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _replica_reads.get()
+        if (
+            state is not None and not state['wrote'] and has_replica()
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _replica_reads.get()
+        if state is not None:
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """The replica gets the schema by replication."""
+        return db != REPLICA_DB_ALIAS
+
+
+@receiver(request_started)
+def check_connections(**kwargs):
+    """
+    Close persistent connections with CONN_HEALTH_CHECKS the database
+    does not answer on any more, so the next query reconnects
+    instead of failing.
+    """
+    for connection in connections.all():
+        if (
+            connection.connection is not None
+            and connection.settings_dict.get('CONN_HEALTH_CHECKS')
+            and not connection.is_usable()
+        ):
+            connection.close()
@@ -0,0 +1,30 @@
+from django.db import models
+
+
+def get_display_value(obj, path):
+    """
+    Return field value for __str__ without querying the database:
+    a related object, or its field given as related__field, only
+    when it is already loaded, otherwise its id, and the primary
+    key in place of a deferred field.
+    """
+    name, _, rest = path.partition('__')
+    field = obj._meta.get_field(name)
+    if field.attname in obj.get_deferred_fields():
+        return f'#{obj.pk}' if not field.is_relation else '#?'
+    if not field.is_relation:
+        return getattr(obj, name)
+    if not field.is_cached(obj):
+        return f'#{getattr(obj, field.attname)}'
+    related = getattr(obj, name)
+    if related is None or not rest:
+        return str(related)
+    return get_display_value(related, rest)
+
+
+class DisplayQuerySet(models.QuerySet):
+    """Queryset able to load what __str__ of its objects shows."""
+
+    def for_display(self):
+        """Select related objects listed in model display_related."""
+        return self.select_related(*self.model.display_related)
@@ -4,3 +4,9 @@ class InvalidShoppingListDataError(Exception):
     """Raised when invalid data for shopping list."""
 
     pass
+
+
+class InvalidRecipeArchiveError(Exception):
+    """Raised when recipe archive cannot be imported."""
+
+    pass
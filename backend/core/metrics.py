@@ -0,0 +1,245 @@
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+SECONDS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+FINGERPRINT_PATTERNS = (
+    (re.compile(r'%s'), '?'),
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def get_fingerprint(sql):
+    """Return sql with literals replaced, so that similar queries match."""
+    for pattern, replacement in FINGERPRINT_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', r'\\').replace('"', r'\"')
+        )
+        for name, value in pairs
+    ) + '}'
+
+
+class Counter:
+    """Prometheus counter with labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values = defaultdict(float)
+
+    def inc(self, labels, amount=1):
+        self.values[labels] += amount
+
+    def collect(self):
+        for labels, value in sorted(self.values.items()):
+            yield f'{self.name}{format_labels(self.labels, labels)} {value}'
+
+
+class Histogram:
+    """Prometheus histogram with labels and fixed buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        # labels -> [count per bucket..., count, sum]
+        self.values = {}
+
+    def observe(self, labels, value):
+        values = self.values.get(labels)
+        if values is None:
+            values = self.values[labels] = [0] * (len(self.buckets) + 2)
+        for number, bound in enumerate(self.buckets):
+            if value <= bound:
+                values[number] += 1
+        values[-2] += 1
+        values[-1] += value
+
+    def collect(self):
+        for labels, values in sorted(self.values.items()):
+            for bound, count in zip(self.buckets, values):
+                yield (
+                    f'{self.name}_bucket'
+                    f'{format_labels(self.labels, labels, [("le", bound)])} '
+                    f'{count}'
+                )
+            yield (
+                f'{self.name}_bucket'
+                f'{format_labels(self.labels, labels, [("le", "+Inf")])} '
+                f'{values[-2]}'
+            )
+            yield (
+                f'{self.name}_count{format_labels(self.labels, labels)} '
+                f'{values[-2]}'
+            )
+            yield (
+                f'{self.name}_sum{format_labels(self.labels, labels)} '
+                f'{values[-1]}'
+            )
+
+
+class RequestMetrics:
+    """
+    Query count and database time of one request, collected as
+    a database execute wrapper, and its serialization time, added
+    by views and renderers. Statements are kept only when asked,
+    for slow request logging.
+    """
+
+    def __init__(self, keep_statements=False):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialization_seconds = 0.0
+        self.serializing_now = False
+        self.statements = [] if keep_statements else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db_seconds += elapsed
+            if self.statements is not None:
+                self.statements.append((sql, elapsed))
+
+    @contextmanager
+    def track(self):
+        """Measure queries on connections of the current thread."""
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def mark(self):
+        """Return the point to measure serialization from."""
+        return time.perf_counter(), self.db_seconds
+
+    def add_serialization(self, mark):
+        """Count time since mark outside the database as serialization."""
+        started, db_seconds = mark
+        self.serialization_seconds += max(
+            time.perf_counter() - started - (self.db_seconds - db_seconds),
+            0.0
+        )
+
+    @contextmanager
+    def serializing(self):
+        """Count the block as serialization, nested blocks once."""
+        if self.serializing_now:
+            yield self
+            return
+        self.serializing_now = True
+        mark = self.mark()
+        try:
+            yield self
+        finally:
+            self.add_serialization(mark)
+            self.serializing_now = False
+
+    def get_top_fingerprints(self, limit=5):
+        """Return (fingerprint, count, seconds) spending most time."""
+        totals = defaultdict(lambda: [0, 0.0])
+        for sql, elapsed in self.statements or ():
+            total = totals[get_fingerprint(sql)]
+            total[0] += 1
+            total[1] += elapsed
+        return sorted(
+            ((sql, count, seconds) for sql, (count, seconds)
+             in totals.items()),
+            key=lambda item: item[2], reverse=True
+        )[:limit]
+
+
+class MetricsRegistry:
+    """
+    Request metrics of this process. Every gunicorn worker
+    keeps its own, each scrape shows the worker answering it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        labels = ('view', 'method')
+        self.requests = Counter(
+            'foodgram_http_requests_total',
+            'Requests by view, method and status.',
+            labels + ('status',)
+        )
+        self.duration = Histogram(
+            'foodgram_http_request_duration_seconds',
+            'Total time of a request.',
+            labels, SECONDS_BUCKETS
+        )
+        self.db_duration = Histogram(
+            'foodgram_http_request_db_seconds',
+            'Time a request spent in database queries.',
+            labels, SECONDS_BUCKETS
+        )
+        self.serialization_duration = Histogram(
+            'foodgram_http_request_serialization_seconds',
+            'Time a request spent outside the database in the view '
+            'handler serializing data and in rendering the response.',
+            labels, SECONDS_BUCKETS
+        )
+        self.queries = Histogram(
+            'foodgram_http_request_queries',
+            'Database queries made by a request.',
+            labels, QUERIES_BUCKETS
+        )
+        self.metrics = (
+            self.requests, self.duration, self.db_duration,
+            self.serialization_duration, self.queries
+        )
+
+    def observe(self, view, method, status, metrics, seconds):
+        labels = (view, method)
+        with self._lock:
+            self.requests.inc(labels + (status,))
+            self.duration.observe(labels, seconds)
+            self.db_duration.observe(labels, metrics.db_seconds)
+            self.serialization_duration.observe(
+                labels, metrics.serialization_seconds
+            )
+            self.queries.observe(labels, metrics.queries)
+
+    def render(self):
+        """Return metrics in Prometheus text format."""
+        lines = []
+        with self._lock:
+            for metric in self.metrics:
+                lines.append(f'# HELP {metric.name} {metric.documentation}')
+                lines.append(f'# TYPE {metric.name} {metric.kind}')
+                lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
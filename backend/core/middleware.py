@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .metrics import RequestMetrics, registry
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """
+    Record time, database time and query count of every request
+    per view and log slow requests with their heaviest queries.
+    Not loaded at all unless METRICS_ENABLED is set.
+    Under asgi queries are measured in async views only, other
+    views run in the handler's own thread and report time only.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_seconds = settings.METRICS_SLOW_REQUEST_SECONDS
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # lets the handler await this instance, as MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def start(self, request):
+        metrics = RequestMetrics(keep_statements=self.slow_seconds is not None)
+        # async views measure their queries in their own threads
+        request.query_metrics = metrics
+        return metrics
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = self.start(request)
+        stack = ExitStack()
+        stack.enter_context(metrics.track())
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            stack.close()
+            raise
+        return self.finish(request, response, metrics, stack)
+
+    async def __acall__(self, request):
+        metrics = self.start(request)
+        response = await self.get_response(request)
+        return self.finish(request, response, metrics, ExitStack())
+
+    def finish(self, request, response, metrics, stack):
+        if response.streaming:
+            response.streaming_content = self.stream(
+                request, response, response.streaming_content, metrics, stack
+            )
+        else:
+            stack.close()
+            self.record(request, response, metrics)
+        return response
+
+    def stream(self, request, response, content, metrics, stack):
+        """Keep measuring until streamed content is sent."""
+        try:
+            yield from content
+        finally:
+            stack.close()
+            self.record(request, response, metrics)
+
+    def record(self, request, response, metrics):
+        seconds = time.perf_counter() - metrics.started
+        match = request.resolver_match
+        view = match.view_name if match else 'unknown'
+        registry.observe(
+            view, request.method, response.status_code, metrics, seconds
+        )
+        if self.slow_seconds is not None and seconds >= self.slow_seconds:
+            self.log_slow_request(request, view, metrics, seconds)
+
+    def log_slow_request(self, request, view, metrics, seconds):
+        fingerprints = ''.join(
+            f'\n  {count} x {query_seconds * 1000:.1f} ms: {sql}'
+            for sql, count, query_seconds in metrics.get_top_fingerprints()
+        )
+        logger.warning(
+            'slow request %s %s (%s): %.3f s, %d queries, %.3f s in db%s',
+            request.method, request.get_full_path(), view, seconds,
+            metrics.queries, metrics.db_seconds, fingerprints
+        )
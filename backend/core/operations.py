@@ -0,0 +1,22 @@
+from django.db.migrations.operations import AddIndex
+
+
+class PostgresAddIndex(AddIndex):
+    """
+    Add index only on PostgreSQL, keeping it in the migration state
+    on every backend, for index types other databases lack.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
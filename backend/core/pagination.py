@@ -1,8 +1,98 @@
+from functools import partial
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from rest_framework import pagination
 
 
+class KnownCountPaginator(Paginator):
+    """Paginator taking the row count the view has already found."""
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            self.count = count
+
+
 class GeneralCustomPagination(pagination.PageNumberPagination):
     """General paginator for most endpoints."""
     page_size = 6
     page_size_query_param = 'limit'
     page_query_param = 'page'
+
+
+class GeneralCursorPagination(pagination.CursorPagination):
+    """Keyset paginator without COUNT and OFFSET scans."""
+    page_size = 6
+    page_size_query_param = 'limit'
+    ordering = ('-date_modified', '-id')
+
+
+class CursorOrPageNumberPagination(GeneralCustomPagination):
+    """
+    Page number paginator switching to keyset pagination
+    when asked with ?pagination=cursor or given a cursor.
+    Views can set cursor_ordering for their keyset.
+    """
+    cursor_mode_query_param = 'pagination'
+    cursor_pagination_class = GeneralCursorPagination
+
+    def is_cursor_mode(self, request):
+        return (
+            request.query_params.get(self.cursor_mode_query_param) == 'cursor'
+            or self.cursor_pagination_class.cursor_query_param
+            in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if not self.is_cursor_mode(request):
+            self.django_paginator_class = partial(
+                KnownCountPaginator,
+                count=getattr(view, 'validated_count', None)
+            )
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_paginator = self.cursor_pagination_class()
+        ordering = getattr(view, 'cursor_ordering', None)
+        if ordering:
+            self.cursor_paginator.ordering = ordering
+        return self.cursor_paginator.paginate_queryset(
+            queryset, request, view
+        )
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator taking the row count of a big unfiltered
+    table from PostgreSQL statistics instead of a COUNT scan.
+    The count is approximate, filtered lists are counted exactly.
+    """
+    estimate_threshold = 10000
+
+    def get_estimate(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where:
+            return None
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [self.object_list.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row else None
+
+    @cached_property
+    def count(self):
+        estimate = self.get_estimate()
+        if estimate is not None and estimate >= self.estimate_threshold:
+            return estimate
+        return super().count
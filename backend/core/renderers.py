@@ -0,0 +1,23 @@
+from contextlib import nullcontext
+
+from rest_framework import renderers
+
+
+class SerializationMetricsRendererMixin:
+    """Count rendering as serialization in request metrics."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        request = (renderer_context or {}).get('request')
+        metrics = getattr(request, 'query_metrics', None)
+        with metrics.serializing() if metrics is not None else nullcontext():
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class JSONRenderer(SerializationMetricsRendererMixin, renderers.JSONRenderer):
+    pass
+
+
+class BrowsableAPIRenderer(
+    SerializationMetricsRendererMixin, renderers.BrowsableAPIRenderer
+):
+    pass
@@ -0,0 +1,212 @@
+import threading
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.http import StreamingHttpResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from api.cache import get_cache
+from api.benchmarks import seed
+from foodgram.models import (FavouriteList, Ingredient, IngredientAmount,
+                             Recipe, ShoppingCartIngredient, ShoppingList,
+                             Subscription, Tag)
+
+from .asgi import ASGIHandler
+from .db import REPLICA_DB_ALIAS, read_from_replica
+
+User = get_user_model()
+
+# models and the related values their labels show
+DISPLAYED = (
+    (Recipe, ('name', 'author__username')),
+    (IngredientAmount, ('recipe__name', 'ingredient__name')),
+    (FavouriteList, ('user__username', 'recipe__name')),
+    (ShoppingList, ('user__username', 'recipe__name')),
+    (ShoppingCartIngredient, ('user__username', 'ingredient__name')),
+    (Subscription, ('user__username', 'author__username')),
+)
+
+
+class DisplayTest(TestCase):
+    """Model labels never query the database."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(
+            recipes=10, ingredients=20, tags=3, users=5, authors=2,
+            favourites=2, carts=2, subscriptions=2
+        )
+
+    def test_no_queries(self):
+        models = [model for model, _ in DISPLAYED] + [Tag, Ingredient, User]
+        for model in models:
+            for obj in (
+                model.objects.first(), model.objects.only('pk').first()
+            ):
+                with self.subTest(model=model.__name__):
+                    with self.assertNumQueries(0):
+                        str(obj)
+                        repr(obj)
+
+    def test_for_display_labels(self):
+        for model, paths in DISPLAYED:
+            with self.subTest(model=model.__name__):
+                obj = model.objects.for_display().first()
+                values = model.objects.filter(pk=obj.pk).values_list(
+                    *paths
+                ).get()
+                with self.assertNumQueries(0):
+                    label = str(obj)
+                for value in values:
+                    self.assertIn(value, label)
+
+
+class ASGIStreamingTest(SimpleTestCase):
+    """Streamed content is read part by part outside the event loop."""
+
+    def test_parts(self):
+        events = []
+
+        def content():
+            for number in range(3):
+                events.append(('read', threading.current_thread().name))
+                yield str(number).encode()
+
+        async def send(message):
+            if message.get('body'):
+                events.append(('send', message['body'].decode()))
+
+        async_to_sync(ASGIHandler().send_response)(
+            StreamingHttpResponse(content()), send
+        )
+        self.assertEqual([event for event, _ in events], ['read', 'send'] * 3)
+        self.assertEqual(
+            [value for event, value in events if event == 'send'],
+            ['0', '1', '2']
+        )
+        for event, thread in events[::2]:
+            self.assertTrue(thread.startswith('asgi-stream'), thread)
+
+
+class ReplicaRoutingTest(TransactionTestCase):
+    """Reads go to a second database alias only when it is safe."""
+
+    def setUp(self):
+        patcher = mock.patch.dict(connections.databases, {
+            REPLICA_DB_ALIAS: connections.databases[DEFAULT_DB_ALIAS].copy()
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(connections.__delitem__, REPLICA_DB_ALIAS)
+        self.addCleanup(connections[REPLICA_DB_ALIAS].close)
+        get_cache().clear()
+        self.user = User.objects.create_user(
+            'author', 'author@foodgram.ru', 'password',
+            first_name='Автор', last_name='Авторов'
+        )
+        self.tag = Tag.objects.create(
+            name='Завтрак', slug='breakfast', color='#ff0000',
+            author=self.user, last_editor=self.user
+        )
+
+    def get_aliases(self, action):
+        """Return aliases action queried, in order."""
+        contexts = {
+            alias: CaptureQueriesContext(connections[alias])
+            for alias in (DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS)
+        }
+        for context in contexts.values():
+            context.__enter__()
+        try:
+            action()
+        finally:
+            for context in contexts.values():
+                context.__exit__(None, None, None)
+        return {alias for alias, context in contexts.items() if len(context)}
+
+    def read(self):
+        return list(Tag.objects.all())
+
+    def test_reads_and_writes(self):
+        self.assertEqual(self.get_aliases(self.read), {DEFAULT_DB_ALIAS})
+        with read_from_replica():
+            self.assertEqual(
+                self.get_aliases(self.read), {REPLICA_DB_ALIAS}
+            )
+            self.assertEqual(
+                self.get_aliases(lambda: Tag.objects.filter(
+                    pk=self.tag.pk
+                ).update(color='#00ff00')),
+                {DEFAULT_DB_ALIAS}
+            )
+            self.assertEqual(self.get_aliases(self.read), {DEFAULT_DB_ALIAS})
+        self.assertEqual(self.get_aliases(self.read), {DEFAULT_DB_ALIAS})
+        with read_from_replica():
+            self.assertEqual(
+                self.get_aliases(self.read), {REPLICA_DB_ALIAS}
+            )
+            with transaction.atomic():
+                self.assertEqual(
+                    self.get_aliases(self.read), {DEFAULT_DB_ALIAS}
+                )
+
+    def test_cached_responses_after_change(self):
+        def get_tags():
+            response = APIClient().get('/api/tags/')
+            self.assertEqual(response.status_code, 200)
+
+        get_cache().clear()
+        self.assertEqual(self.get_aliases(get_tags), {REPLICA_DB_ALIAS})
+        self.tag.save()
+        self.assertEqual(self.get_aliases(get_tags), {DEFAULT_DB_ALIAS})
+        get_cache().clear()
+        self.assertEqual(self.get_aliases(get_tags), {REPLICA_DB_ALIAS})
+
+    def test_reads_after_user_relation_change(self):
+        recipe = Recipe.objects.create(
+            name='Каша', text='Сварить.', image='recipes/benchmark.png',
+            image_variants={'source': 'recipes/benchmark.png'},
+            cooking_time=10, author=self.user, last_editor=self.user
+        )
+        reader = User.objects.create_user(
+            'reader', 'reader@foodgram.ru', 'password',
+            first_name='Читатель', last_name='Читателев'
+        )
+        path = f'/api/recipes/{recipe.pk}/'
+
+        def get_recipe(user):
+            def get():
+                client = APIClient()
+                client.force_authenticate(user)
+                response = client.get(path)
+                self.assertEqual(response.status_code, 200)
+            return get
+
+        get_cache().clear()
+        self.assertEqual(
+            self.get_aliases(get_recipe(reader)), {REPLICA_DB_ALIAS}
+        )
+        client = APIClient()
+        client.force_authenticate(reader)
+        for relation in ('favorite', 'shopping_cart'):
+            with self.subTest(relation=relation):
+                for method in (client.post, client.delete):
+                    response = method(f'{path}{relation}/')
+                    self.assertIn(response.status_code, (201, 204))
+                    self.assertEqual(
+                        self.get_aliases(get_recipe(reader)),
+                        {DEFAULT_DB_ALIAS}
+                    )
+                    self.assertEqual(
+                        self.get_aliases(get_recipe(self.user)),
+                        {REPLICA_DB_ALIAS}
+                    )
+                    get_cache().clear()
+        response = client.post(f'/api/users/{self.user.pk}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            self.get_aliases(get_recipe(reader)), {DEFAULT_DB_ALIAS}
+        )
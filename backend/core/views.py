@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from .metrics import registry
+
+
+def metrics_view(request):
+    """
+    Export request metrics in Prometheus text format,
+    given METRICS_TOKEN as a bearer token when it is set.
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4'
+    )
@@ -1,5 +1,8 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
 from import_export.admin import ImportExportModelAdmin
+from core.pagination import EstimatedCountPaginator
 
 from .models import (FavouriteList, Ingredient, IngredientAmount, Recipe,
                      ShoppingList, Subscription, Tag)
@@ -8,12 +11,72 @@ from .resources import (FavouriteResource, IngredientAmountResource,
                         SubscriptionResource, TagResource)
 
 
-class IngredientInLine(admin.StackedInline):
+class DisplayAdminMixin:
+    """
+    Load objects with what their __str__ shows: change form titles,
+    inline headers, autocomplete results and log entries show names.
+    """
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).for_display()
+
+
+class LoadedAutocompleteSelect(AutocompleteSelect):
+    """
+    Autocomplete select labelling the object its form instance
+    already has loaded instead of querying it for every form.
+    """
+
+    selected = None
+
+    def optgroups(self, name, value, attr=None):
+        if (
+            self.selected is None or not self.is_required
+            or [str(item) for item in value] != [str(self.selected.pk)]
+        ):
+            return super().optgroups(name, value, attr)
+        return [(None, [self.create_option(
+            name, self.selected.pk,
+            self.choices.field.label_from_instance(self.selected), True, 0
+        )], 0)]
+
+
+class IngredientInLineForm(forms.ModelForm):
+    """Ingredient amount form labelling its ingredient without a query."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.ingredient_id is not None:
+            self.fields['ingredient'].widget.widget.selected = (
+                self.instance.ingredient
+            )
+
+
+class IngredientInLine(DisplayAdminMixin, admin.StackedInline):
     """Inlines to add multiple ingredients to a recipe."""
 
     model = IngredientAmount
+    form = IngredientInLineForm
     extra = 0
     min_num = 1
+    autocomplete_fields = ('ingredient',)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'ingredient':
+            kwargs['widget'] = LoadedAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get('using')
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class BigTableAdminMixin:
+    """
+    Changelists of big tables: estimated row count
+    and no extra count of unfiltered rows.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class SaveAuthorEditorMixin:
@@ -23,6 +86,7 @@ class SaveAuthorEditorMixin:
 
     empty_value_display = '-пусто-'
     search_fields = ('name',)
+    list_select_related = ('last_editor',)
 
     def save_model(self, request, obj, form, change):
         if not change:
@@ -41,7 +105,8 @@ class SaveAuthorEditorMixin:
 
 
 @admin.register(Tag)
-class TagAdmin(SaveAuthorEditorMixin, ImportExportModelAdmin):
+class TagAdmin(DisplayAdminMixin, SaveAuthorEditorMixin,
+               ImportExportModelAdmin):
     """Tags administration."""
 
     resource_class = TagResource
@@ -57,7 +122,8 @@ class TagAdmin(SaveAuthorEditorMixin, ImportExportModelAdmin):
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(SaveAuthorEditorMixin, ImportExportModelAdmin):
+class IngredientAdmin(DisplayAdminMixin, SaveAuthorEditorMixin,
+                      BigTableAdminMixin, ImportExportModelAdmin):
     """Ingredients administration."""
 
     resource_class = IngredientResource
@@ -71,7 +137,8 @@ class IngredientAdmin(SaveAuthorEditorMixin, ImportExportModelAdmin):
 
 
 @admin.register(IngredientAmount)
-class IngredientAmountAdmin(ImportExportModelAdmin):
+class IngredientAmountAdmin(DisplayAdminMixin, BigTableAdminMixin,
+                            ImportExportModelAdmin):
     """IngredientAmounts administration."""
 
     resource_class = IngredientAmountResource
@@ -81,11 +148,14 @@ class IngredientAmountAdmin(ImportExportModelAdmin):
         'ingredient',
         'amount'
     )
+    list_select_related = ('recipe__author', 'ingredient')
     search_fields = ('ingredient__name', 'recipe__name')
+    autocomplete_fields = ('recipe', 'ingredient')
 
 
 @admin.register(Recipe)
-class RecipeAdmin(SaveAuthorEditorMixin, ImportExportModelAdmin):
+class RecipeAdmin(DisplayAdminMixin, SaveAuthorEditorMixin,
+                  BigTableAdminMixin, ImportExportModelAdmin):
     """Recipes administration."""
 
     resource_class = RecipeResource
@@ -97,32 +167,34 @@ class RecipeAdmin(SaveAuthorEditorMixin, ImportExportModelAdmin):
         'get_favourite_add_count',
         'date_created'
     )
+    list_select_related = ('author',)
     search_fields = (
         'name', 'author__username', 'author__last_name',
         'tags__name'
     )
+    autocomplete_fields = ('author', 'last_editor', 'tags')
     inlines = [IngredientInLine]
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        return qs.prefetch_related('tags', 'ingredients')
+        return qs.defer('search_vector').prefetch_related('tags')
 
     def get_tags(self, obj):
-        return ', '.join(obj.tags.values_list('name', flat=True))
+        return ', '.join(tag.name for tag in obj.tags.all())
 
     def get_favourite_add_count(self, obj):
-        return FavouriteList.objects.filter(
-            recipe_id=obj.id
-        ).count()
+        return obj.favourites_count
 
     get_tags.short_description = 'Теги'
     get_favourite_add_count.short_description = (
         'Добавлений в избранное'
     )
+    get_favourite_add_count.admin_order_field = 'favourites_count'
 
 
 @admin.register(FavouriteList)
-class FavouriteListAdmin(ImportExportModelAdmin):
+class FavouriteListAdmin(DisplayAdminMixin, BigTableAdminMixin,
+                         ImportExportModelAdmin):
     """Favourite recipes list administration."""
 
     resource_class = FavouriteResource
@@ -132,7 +204,9 @@ class FavouriteListAdmin(ImportExportModelAdmin):
         'recipe',
         'date_created'
     )
+    list_select_related = ('user', 'recipe__author')
     search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(ShoppingList)
@@ -143,7 +217,8 @@ class ShoppingListAdmin(FavouriteListAdmin):
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(ImportExportModelAdmin):
+class SubscriptionAdmin(DisplayAdminMixin, BigTableAdminMixin,
+                        ImportExportModelAdmin):
     """Subscriptions administration."""
 
     resource_class = SubscriptionResource
@@ -153,7 +228,9 @@ class SubscriptionAdmin(ImportExportModelAdmin):
         'author',
         'date_created'
     )
+    list_select_related = ('user', 'author')
     search_fields = (
         'user__username', 'user__last_name',
         'author__username', 'author__last_name'
     )
+    autocomplete_fields = ('user', 'author')
@@ -0,0 +1,56 @@
+# Generated by Django 3.2.13 on 2026-10-18 02:07
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def fill_shopping_cart_ingredients(apps, schema_editor):
+    IngredientAmount = apps.get_model('foodgram', 'IngredientAmount')
+    ShoppingCartIngredient = apps.get_model(
+        'foodgram', 'ShoppingCartIngredient'
+    )
+    totals = IngredientAmount.objects.filter(
+        recipe__foodgram_shoppinglist_recipes__isnull=False
+    ).values(
+        'recipe__foodgram_shoppinglist_recipes__user', 'ingredient'
+    ).annotate(total=Sum('amount')).order_by()
+    ShoppingCartIngredient.objects.bulk_create(
+        ShoppingCartIngredient(
+            user_id=row['recipe__foodgram_shoppinglist_recipes__user'],
+            ingredient_id=row['ingredient'],
+            total_amount=row['total']
+        ) for row in totals.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('foodgram', '0007_auto_20220523_2340'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.PositiveIntegerField(verbose_name='Общее количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_ingredients', to='foodgram.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_ingredients', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент списка покупок',
+                'verbose_name_plural': 'Ингредиенты списков покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcartingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_user_cart_ingredient'),
+        ),
+        migrations.RunPython(
+            fill_shopping_cart_ingredients, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.13 on 2026-10-18 02:21
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_related(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(value=Count('pk')).values('value')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('foodgram', 'Recipe')
+    User = apps.get_model('users', 'User')
+    FavouriteList = apps.get_model('foodgram', 'FavouriteList')
+    ShoppingList = apps.get_model('foodgram', 'ShoppingList')
+    Subscription = apps.get_model('foodgram', 'Subscription')
+    Recipe.objects.update(
+        favourites_count=count_related(FavouriteList, 'recipe'),
+        shopping_cart_count=count_related(ShoppingList, 'recipe')
+    )
+    User.objects.update(
+        followers_count=count_related(Subscription, 'author'),
+        recipes_count=count_related(Recipe, 'author')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0009_recipe_image_variants'),
+        ('users', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favourites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в список покупок'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favourites_count', '-id'], name='recipe_popularity_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.13 on 2026-10-18 02:25
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+from core.operations import PostgresAddIndex
+
+
+def fill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('foodgram', 'Recipe')
+    IngredientAmount = apps.get_model('foodgram', 'IngredientAmount')
+    ingredient_names = IngredientAmount.objects.filter(
+        recipe=OuterRef('pk')
+    ).order_by().values('recipe').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names')
+    config = settings.RECIPE_SEARCH_CONFIG
+    Recipe.objects.update(search_vector=(
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(Subquery(ingredient_names), weight='B', config=config)
+        + SearchVector('text', weight='C', config=config)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0010_popularity_counters'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        PostgresAddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+        PostgresAddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='recipe_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+    ]
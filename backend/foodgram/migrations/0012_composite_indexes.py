@@ -0,0 +1,75 @@
+# Generated by Django 3.2.13 on 2026-10-18 03:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('foodgram', '0011_recipe_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favouritelist',
+            index=models.Index(fields=['user', '-date_created'], name='favouritelist_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredientamount',
+            index=models.Index(fields=['ingredient', 'recipe'], name='amount_ingredient_recipe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-date_modified', '-id'], name='recipe_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-date_modified', '-id'], name='recipe_author_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppinglist',
+            index=models.Index(fields=['user', '-date_created'], name='shoppinglist_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['user', '-date_created'], name='subscription_user_date_idx'),
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX recipe_tags_tag_recipe_idx '
+            'ON foodgram_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX recipe_tags_tag_recipe_idx'
+        ),
+        migrations.AlterField(
+            model_name='favouritelist',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='foodgram_favouritelist_users', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='ingredientamount',
+            name='ingredient',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='ingredient_amounts', to='foodgram.ingredient', verbose_name='Ингредиент'),
+        ),
+        migrations.AlterField(
+            model_name='ingredientamount',
+            name='recipe',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='ingredient_amounts', to='foodgram.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcartingredient',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_ingredients', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='shoppinglist',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='foodgram_shoppinglist_users', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='subscription',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='follower', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик'),
+        ),
+    ]
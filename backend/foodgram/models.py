@@ -1,11 +1,15 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
+from core.display import DisplayQuerySet, get_display_value
 
 MIN_ING_AMOUNT = 1
 MIN_COOK_TIME = 1
 MAX_NAME_LENGTH = 200
 MAX_UNIT_LENGTH = 200
+POPULAR_ORDERING = ('-favourites_count', '-id')
 
 
 User = get_user_model()
@@ -42,12 +46,19 @@ class CustomBaseModel(models.Model):
         related_name='%(app_label)s_%(class)s_editors'
     )
 
+    objects = DisplayQuerySet.as_manager()
+    # related objects shown by __str__, see DisplayQuerySet.for_display
+    display_related = ('author',)
+
     class Meta:
         abstract = True
         ordering = ['-date_modified']
 
     def __str__(self):
-        return f'{self.name} - {self.author}'
+        return (
+            f'{get_display_value(self, "name")} '
+            f'- {get_display_value(self, "author")}'
+        )
 
 
 class Tag(CustomBaseModel):
@@ -69,12 +80,18 @@ class Tag(CustomBaseModel):
         unique=True
     )
 
+    display_related = ()
+
     class Meta(CustomBaseModel.Meta):
         verbose_name = 'Тег'
         verbose_name_plural = 'Теги'
 
     def __str__(self):
-        return f'{self.name} - {self.slug} - {self.color}'
+        return (
+            f'{get_display_value(self, "name")} '
+            f'- {get_display_value(self, "slug")} '
+            f'- {get_display_value(self, "color")}'
+        )
 
 
 class Ingredient(CustomBaseModel):
@@ -85,6 +102,8 @@ class Ingredient(CustomBaseModel):
         max_length=MAX_UNIT_LENGTH
     )
 
+    display_related = ()
+
     class Meta(CustomBaseModel.Meta):
         constraints = [
             models.UniqueConstraint(
@@ -96,7 +115,10 @@ class Ingredient(CustomBaseModel):
         verbose_name_plural = 'Ингредиенты'
 
     def __str__(self):
-        return f'{self.name} [{self.measurement_unit}]'
+        return (
+            f'{get_display_value(self, "name")} '
+            f'[{get_display_value(self, "measurement_unit")}]'
+        )
 
 
 class Recipe(CustomBaseModel):
@@ -109,6 +131,27 @@ class Recipe(CustomBaseModel):
         verbose_name='Картинка',
         upload_to='recipes/'
     )
+    image_variants = models.JSONField(
+        verbose_name='Варианты картинки',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    favourites_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0,
+        editable=False
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в список покупок',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False
+    )
     cooking_time = models.PositiveIntegerField(
         verbose_name='Время приготовления в минутах',
         validators=[
@@ -131,27 +174,50 @@ class Recipe(CustomBaseModel):
     )
 
     class Meta(CustomBaseModel.Meta):
+        indexes = [
+            models.Index(
+                fields=list(POPULAR_ORDERING),
+                name='recipe_popularity_idx'
+            ),
+            models.Index(
+                fields=['-date_modified', '-id'],
+                name='recipe_feed_idx'
+            ),
+            models.Index(
+                fields=['author', '-date_modified', '-id'],
+                name='recipe_author_feed_idx'
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='recipe_search_vector_idx'
+            ),
+            GinIndex(
+                fields=['name'],
+                name='recipe_name_trgm_idx',
+                opclasses=['gin_trgm_ops']
+            )
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
-    def __str__(self):
-        return f'{self.name} - {self.author}'
-
 
 class IngredientAmount(models.Model):
     """Model to match ingredient to amounts for a recipe."""
 
+    # both foreign keys are covered by composite indexes below
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
         related_name='ingredient_amounts',
-        verbose_name='Рецепт'
+        verbose_name='Рецепт',
+        db_index=False
     )
     ingredient = models.ForeignKey(
         Ingredient,
         on_delete=models.CASCADE,
         related_name='ingredient_amounts',
-        verbose_name='Ингредиент'
+        verbose_name='Ингредиент',
+        db_index=False
     )
     amount = models.PositiveIntegerField(
         verbose_name='Количество',
@@ -163,6 +229,9 @@ class IngredientAmount(models.Model):
         ]
     )
 
+    objects = DisplayQuerySet.as_manager()
+    display_related = ('recipe', 'ingredient')
+
     class Meta:
         ordering = ['ingredient']
         verbose_name = 'Количество ингредиента'
@@ -173,9 +242,19 @@ class IngredientAmount(models.Model):
                 name='unique_recipe_ingredient'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['ingredient', 'recipe'],
+                name='amount_ingredient_recipe_idx'
+            )
+        ]
 
     def __str__(self):
-        return f'{self.recipe.name} - {self.ingredient} {self.amount}'
+        return (
+            f'{get_display_value(self, "recipe__name")} '
+            f'- {get_display_value(self, "ingredient")} '
+            f'{get_display_value(self, "amount")}'
+        )
 
 
 class GeneralListBaseModel(models.Model):
@@ -191,7 +270,8 @@ class GeneralListBaseModel(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='%(app_label)s_%(class)s_users',
-        verbose_name='Пользователь'
+        verbose_name='Пользователь',
+        db_index=False
     )
     date_created = models.DateTimeField(
         verbose_name='Дата создания',
@@ -199,6 +279,9 @@ class GeneralListBaseModel(models.Model):
         db_index=True
     )
 
+    objects = DisplayQuerySet.as_manager()
+    display_related = ('user', 'recipe__author')
+
     class Meta:
         abstract = True
         ordering = ['-date_created']
@@ -208,9 +291,19 @@ class GeneralListBaseModel(models.Model):
                 name='%(app_label)s_%(class)s_unique'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['user', '-date_created'],
+                name='%(class)s_user_date_idx'
+            ),
+        ]
 
     def __str__(self):
-        return f'{self.user} - {self.recipe} - {self.date_created}'
+        return (
+            f'{get_display_value(self, "user")} '
+            f'- {get_display_value(self, "recipe")} '
+            f'- {get_display_value(self, "date_created")}'
+        )
 
 
 class FavouriteList(GeneralListBaseModel):
@@ -229,6 +322,47 @@ class ShoppingList(GeneralListBaseModel):
         verbose_name_plural = 'Списки покупок'
 
 
+class ShoppingCartIngredient(models.Model):
+    """Precomputed ingredient totals of user's shopping list."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_ingredients',
+        verbose_name='Пользователь',
+        db_index=False
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_ingredients',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Общее количество'
+    )
+
+    objects = DisplayQuerySet.as_manager()
+    display_related = ('user', 'ingredient')
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_user_cart_ingredient'
+            )
+        ]
+
+    def __str__(self):
+        return (
+            f'{get_display_value(self, "user")} '
+            f'- {get_display_value(self, "ingredient")} '
+            f'{get_display_value(self, "total_amount")}'
+        )
+
+
 class Subscription(models.Model):
     """Subscriptions to authors of recipes."""
 
@@ -236,7 +370,8 @@ class Subscription(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='follower',
-        verbose_name='Подписчик'
+        verbose_name='Подписчик',
+        db_index=False
     )
     author = models.ForeignKey(
         User,
@@ -250,6 +385,9 @@ class Subscription(models.Model):
         db_index=True
     )
 
+    objects = DisplayQuerySet.as_manager()
+    display_related = ('user', 'author')
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -257,13 +395,19 @@ class Subscription(models.Model):
                 name='unique_following'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['user', '-date_created'],
+                name='subscription_user_date_idx'
+            )
+        ]
         ordering = ['-date_created']
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
 
     def __str__(self):
         return (
-            f'{self.date_created} '
-            f'- {self.user.username} '
-            f'подписался на {self.author.username}'
+            f'{get_display_value(self, "date_created")} '
+            f'- {get_display_value(self, "user__username")} '
+            f'подписался на {get_display_value(self, "author__username")}'
         )
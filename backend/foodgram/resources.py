@@ -3,6 +3,13 @@ from foodgram.models import (FavouriteList, Ingredient, IngredientAmount,
                              Recipe, ShoppingList, Subscription, Tag)
 
 
+class DisplayModelResource(resources.ModelResource):
+    """Resource loading objects with what their __str__ shows."""
+
+    def get_queryset(self):
+        return super().get_queryset().for_display()
+
+
 class SaveAuthorEditorResourceMixin:
     """Mixin to save author/editor."""
 
@@ -11,7 +18,7 @@ class SaveAuthorEditorResourceMixin:
         row['last_editor'] = kwargs['user'].id
 
 
-class TagResource(resources.ModelResource):
+class TagResource(DisplayModelResource):
     """Resource to import/export tags via admin panel."""
 
     class Meta:
@@ -20,7 +27,7 @@ class TagResource(resources.ModelResource):
 
 class IngredientResource(
     SaveAuthorEditorResourceMixin,
-    resources.ModelResource
+    DisplayModelResource
 ):
     """Resource to import/export ingredients via admin panel."""
 
@@ -28,35 +35,35 @@ class IngredientResource(
         model = Ingredient
 
 
-class FavouriteResource(resources.ModelResource):
+class FavouriteResource(DisplayModelResource):
     """Resource to import/export favourite list via admin panel"""
 
     class Meta:
         model = FavouriteList
 
 
-class SubscriptionResource(resources.ModelResource):
+class SubscriptionResource(DisplayModelResource):
     """Resource to import/export subscription list via admin panel"""
 
     class Meta:
         model = Subscription
 
 
-class IngredientAmountResource(resources.ModelResource):
+class IngredientAmountResource(DisplayModelResource):
     """Resource to import/export ingredient amount matches via admin panel"""
 
     class Meta:
         model = IngredientAmount
 
 
-class ShoppingResource(resources.ModelResource):
+class ShoppingResource(DisplayModelResource):
     """Resource to import/export list via admin panel"""
 
     class Meta:
         model = ShoppingList
 
 
-class RecipeResource(resources.ModelResource):
+class RecipeResource(DisplayModelResource):
     """Resource to import/export ingredient amount matches via admin panel"""
 
     class Meta:
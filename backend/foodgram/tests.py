@@ -0,0 +1,112 @@
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase
+from api.benchmarks import seed
+from core.pagination import EstimatedCountPaginator
+
+from .models import (FavouriteList, Ingredient, IngredientAmount, Recipe,
+                     ShoppingList, Subscription, Tag)
+
+User = get_user_model()
+
+
+class AdminQueryBudgetTest(TestCase):
+    """Admin pages make a fixed number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(
+            recipes=100, ingredients=100, tags=100, users=100, authors=5,
+            favourites=5, carts=3, subscriptions=4
+        )
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@foodgram.ru', 'password',
+            first_name='Админ', last_name='Админов'
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def assert_changelist_queries(self, model, path, queries):
+        model_admin = admin.site._registry[model]
+        if connection.vendor == 'postgresql' and issubclass(
+            model_admin.paginator, EstimatedCountPaginator
+        ):
+            # table statistics are read before counting a small table
+            queries += 1
+        for per_page in (10, 100):
+            with self.subTest(path=path, per_page=per_page):
+                with mock.patch.object(
+                    model_admin, 'list_per_page', per_page
+                ), self.assertNumQueries(queries):
+                    response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    len(response.context['cl'].result_list), per_page
+                )
+
+    def test_recipe_changelist(self):
+        self.assert_changelist_queries(Recipe, '/admin/foodgram/recipe/', 5)
+
+    def test_ingredient_amount_changelist(self):
+        self.assert_changelist_queries(
+            IngredientAmount, '/admin/foodgram/ingredientamount/', 4
+        )
+
+    def test_tag_changelist(self):
+        self.assert_changelist_queries(Tag, '/admin/foodgram/tag/', 5)
+
+    def test_ingredient_changelist(self):
+        self.assert_changelist_queries(
+            Ingredient, '/admin/foodgram/ingredient/', 4
+        )
+
+    def test_favourite_list_changelist(self):
+        self.assert_changelist_queries(
+            FavouriteList, '/admin/foodgram/favouritelist/', 4
+        )
+
+    def test_shopping_list_changelist(self):
+        self.assert_changelist_queries(
+            ShoppingList, '/admin/foodgram/shoppinglist/', 4
+        )
+
+    def test_subscription_changelist(self):
+        self.assert_changelist_queries(
+            Subscription, '/admin/foodgram/subscription/', 4
+        )
+
+    def test_user_changelist(self):
+        self.assert_changelist_queries(User, '/admin/users/user/', 4)
+
+    def test_recipe_change_form(self):
+        recipes = Recipe.objects.annotate(
+            amounts=Count('ingredient_amounts')
+        ).order_by('amounts')
+        for recipe in (recipes.first(), recipes.last()):
+            ContentType.objects.clear_cache()
+            with self.subTest(ingredients=recipe.amounts):
+                with self.assertNumQueries(11):
+                    response = self.client.get(
+                        f'/admin/foodgram/recipe/{recipe.pk}/change/'
+                    )
+                self.assertEqual(response.status_code, 200)
+                for amount in recipe.ingredient_amounts.select_related(
+                    'ingredient'
+                ):
+                    self.assertContains(response, amount.ingredient.name)
+
+    def test_autocomplete_labels(self):
+        recipe = Recipe.objects.select_related('author').first()
+        response = self.client.get('/admin/autocomplete/', {
+            'app_label': 'foodgram', 'model_name': 'ingredientamount',
+            'field_name': 'recipe', 'term': recipe.name
+        })
+        self.assertEqual(response.status_code, 200)
+        labels = [item['text'] for item in response.json()['results']]
+        self.assertIn(f'{recipe.name} - {recipe.author}', labels)
@@ -1,7 +1,9 @@
 import os
 
-from django.core.asgi import get_asgi_application
+from core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_app.settings')
+# read endpoints are served by async views under an asgi server
+os.environ.setdefault('ASYNC_VIEWS', 'true')
 
 application = get_asgi_application()
@@ -19,6 +19,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -30,6 +31,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,7 +69,47 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'foodgram'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'foodgram'),
         'HOST': os.getenv('DB_HOST', '192.168.0.105'),
-        'PORT': os.getenv('DB_PORT', 5433)
+        'PORT': os.getenv('DB_PORT', 5433),
+        # seconds a connection stays open for the next requests
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        # ping a kept connection before reusing it
+        'CONN_HEALTH_CHECKS': (
+            os.getenv('DB_CONN_HEALTH_CHECKS', 'true').lower() == 'true'
+        ),
+        # connections per process with ENGINE core.backends.postgresql
+        'POOL_SIZE': int(os.getenv('DB_POOL_SIZE', 10)),
+        'POOL_TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+    }
+}
+
+# read only copy of the database for list and detail reads
+if os.getenv('DB_REPLICA_HOST') or os.getenv('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': os.getenv('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# seconds cached responses are read from the primary after a change,
+# longer than the replica usually lags
+REPLICA_LAG_SECONDS = float(os.getenv('DB_REPLICA_LAG_SECONDS', 5))
+
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+
+# the response cache, its namespace versions and hit/miss stats live
+# here, LocMemCache keeps them per process: with more than one worker
+# (WEB_CONCURRENCY, checked by api.E001) or to let management commands
+# invalidate responses of the running server set a shared backend,
+# e.g. django.core.cache.backends.db.DatabaseCache with a table name
+# in CACHE_LOCATION (created by createcachetable) or Memcached
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
     }
 }
 
@@ -119,6 +161,10 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.JSONRenderer',
+        'core.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
@@ -137,3 +183,63 @@ DJOSER = {
         'user': 'api.serializers.CustomUserSerializer'
     }
 }
+
+INGREDIENT_SEARCH_LIMIT = 50
+
+RECIPE_SEARCH_CONFIG = os.getenv('RECIPE_SEARCH_CONFIG', 'russian')
+
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 300))
+
+PANTRY_INDEX_TTL = int(os.getenv('PANTRY_INDEX_TTL', 600))
+
+PANTRY_MATCH_LIMIT = 20
+
+PANTRY_MATCH_MAX_LIMIT = 100
+
+SHOPPING_LIST_CHUNK_SIZE = 500
+
+# pdf shopping lists are rendered whole before sending, in memory
+# up to this size and in a temporary file beyond it
+SHOPPING_LIST_SPOOL_SIZE = 1024 * 1024
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+IMAGE_PIPELINE_BACKEND = os.getenv(
+    'IMAGE_PIPELINE_BACKEND', 'api.images.ThreadPoolImageBackend'
+)
+
+IMAGE_PIPELINE_WORKERS = int(os.getenv('IMAGE_PIPELINE_WORKERS', 2))
+
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': {'size': (480, 480), 'format': 'WEBP', 'quality': 75},
+    'webp': {'format': 'WEBP', 'quality': 80},
+}
+
+MAX_IMAGE_UPLOAD_SIZE = int(
+    os.getenv('MAX_IMAGE_UPLOAD_SIZE', 10 * 1024 * 1024)
+)
+
+MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', 40_000_000))
+
+RESPONSE_CACHE_ALIAS = 'default'
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 600))
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# requests slower than this are logged with their heaviest queries
+METRICS_SLOW_REQUEST_SECONDS = (
+    float(os.getenv('METRICS_SLOW_REQUEST_SECONDS'))
+    if os.getenv('METRICS_SLOW_REQUEST_SECONDS') else None
+)
+
+# set by foodgram_app.asgi, read endpoints then run in a thread pool
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'false').lower() == 'true'
+
+# pool threads per process, each keeps its own database connection
+ASYNC_VIEW_THREADS = int(os.getenv('ASYNC_VIEW_THREADS', 10))
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from core.pagination import EstimatedCountPaginator
 
 from .models import User
 
@@ -20,3 +21,5 @@ class CustomUserAdmin(UserAdmin):
     list_editable = ('is_active', 'is_superuser')
     list_filter = ('is_active', 'is_superuser')
     search_fields = ('username', 'email', 'last_name')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.13 on 2026-10-18 14:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='date_modified',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата последнего редактирования'),
+            preserve_default=False,
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from core.display import get_display_value
 
 
 class User(AbstractUser):
@@ -8,6 +9,21 @@ class User(AbstractUser):
     email = models.EmailField(
         'Email адрес', unique=True
     )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+        editable=False
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов',
+        default=0,
+        editable=False
+    )
+    date_modified = models.DateTimeField(
+        verbose_name='Дата последнего редактирования',
+        auto_now=True,
+        db_index=True
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
@@ -17,7 +33,7 @@ class User(AbstractUser):
 
     def __str__(self):
         return (
-            f'{self.username} '
-            f'- {self.last_name} '
-            f'- {self.email}'
+            f'{get_display_value(self, "username")} '
+            f'- {get_display_value(self, "last_name")} '
+            f'- {get_display_value(self, "email")}'
         )